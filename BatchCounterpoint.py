@@ -0,0 +1,107 @@
+"""
+This file holds a vectorized version of the FirstIteration algorithm defined in Counterpoint.py.  Rather than choosing the pitches
+of one contrapuntal line at a time, it keeps every line of a batch in a single NumPy array and chooses the pitch at each position
+for all of the lines at once.
+"""
+
+# NumPy does the work of advancing every line together
+import numpy
+
+# Seeds may also be given as a random.Random instance, as they are for an Exercise
+from random import Random
+
+# The same fundamentals and cantus firmi are used as in Counterpoint.py
+from MusicFundamentals import Fundamentals
+from CantusFirmi import CantusFirmus
+
+fundamentals = Fundamentals()
+
+
+def FirstIterationBatch(Species, Mode, Count, Seed=None):
+    """
+    This function generates a batch of first iteration counterpoints for a given species and mode.  It follows FirstIteration
+    rule for rule: a random perfect consonance to begin, then imperfect consonances in contrary motion, perfect consonances in
+    contrary motion, and imperfect consonances in parallel motion, in that order of priority, and a fixed cadence.  Since the
+    opening pitch is the only random choice, the lines come out with exactly the same distribution as FirstIteration.
+
+    The lines are returned as a two dimensional array with one row per exercise and one column per position in the cantus.
+    As in FirstIteration, a 0 marks a position where no suitable pitch was found.
+
+    The openings are drawn from a NumPy Generator made from Seed, which can be a number, None, a SeedSequence, a Generator, or a
+    random.Random instance.
+    """
+
+    if isinstance(Seed, Random):
+        Seed = Seed.getrandbits(64)
+    Generator = numpy.random.default_rng(Seed)
+
+    CF = CantusFirmus()
+    Cantus = CF.GetCantus(Species, Mode)
+
+    Counterpoint = numpy.zeros((Count, len(Cantus)), dtype=numpy.int8)
+
+    for i in range(len(Cantus)):
+        # The first interval is a perfect consonance chosen at random for each line
+        if i == 0:
+            Openings = numpy.array(fundamentals.PerfectConsonantIntervals, dtype=numpy.int8)
+            Counterpoint[:, i] = Cantus[i] + Openings[Generator.integers(0, len(Openings), Count)]
+
+        # The cadence is the same for every line
+        elif i == len(Cantus) - 2:
+            Counterpoint[:, i] = Cantus[i] + 9
+        elif i == len(Cantus) - 1:
+            Counterpoint[:, i] = Cantus[i] + 12
+
+        else:
+            # The direction of the cantus is the same for every line, but the previous counterpoint pitch is not
+            CantusDirection = Cantus[i] - Cantus[i - 1]
+            PreviousPitch = Counterpoint[:, i - 1].astype(numpy.int16)
+            PreviousInterval = PreviousPitch - Cantus[i - 1]
+
+            # This mask keeps track of which lines are still waiting for a pitch at this position
+            PitchFound = numpy.zeros(Count, dtype=bool)
+
+            # Imperfect consonances in contrary motion, then perfect consonances in contrary motion
+            for Intervals in (fundamentals.ImperfectConsonantIntervals, fundamentals.PerfectConsonantIntervals):
+                for each in Intervals:
+                    PitchToCheck = Cantus[i] + each
+
+                    # Whether the pitch is within the mode depends only on the cantus, so it is the same for every line
+                    if not fundamentals.InMode(PitchToCheck):
+                        continue
+
+                    ResultingCounterpointDirection = PitchToCheck - PreviousPitch
+                    if CantusDirection < 0:
+                        Suitable = ResultingCounterpointDirection >= 0
+                    elif CantusDirection > 0:
+                        Suitable = ResultingCounterpointDirection <= 0
+                    else:
+                        Suitable = ResultingCounterpointDirection != 0
+
+                    Suitable &= ~PitchFound
+                    Counterpoint[Suitable, i] = PitchToCheck
+                    PitchFound |= Suitable
+
+            # Imperfect consonances in parallel motion, which are only allowed if the previous interval was not perfect
+            Allowed = ~numpy.isin(PreviousInterval, fundamentals.PerfectConsonantIntervals)
+            for each in fundamentals.ImperfectConsonantIntervals:
+                PitchToCheck = Cantus[i] + each
+
+                if not fundamentals.InMode(PitchToCheck):
+                    continue
+
+                ResultingCounterpointDirection = PitchToCheck - PreviousPitch
+                if CantusDirection < 0:
+                    Suitable = ResultingCounterpointDirection < 0
+                elif CantusDirection > 0:
+                    Suitable = ResultingCounterpointDirection > 0
+                else:
+                    Suitable = ResultingCounterpointDirection == 0
+
+                Suitable &= Allowed & ~PitchFound
+                Counterpoint[Suitable, i] = PitchToCheck
+                PitchFound |= Suitable
+
+            # Any line still without a pitch keeps the 0 it was created with
+
+    return Counterpoint
@@ -0,0 +1,210 @@
+"""
+This file measures how quickly each version of the algorithm generates exercises, and how often it fails to find a suitable
+pitch.  The results can be saved as a baseline and later runs compared against it, so that every change to Counterpoint.py can
+be measured rather than guessed.
+"""
+
+# The results are stored as JSON
+import json
+
+# The timings are taken with the most precise clock available
+from time import perf_counter
+
+# The "Failed to find a pitch" messages are kept out of the report
+import os
+from contextlib import redirect_stdout
+
+# The benchmark is run from the command line
+from argparse import ArgumentParser
+
+# The exercises themselves come from the Counterpoint class, against the cantus firmi defined in CantusFirmi.py
+from Counterpoint import Exercise
+from CantusFirmi import CantusFirmus
+
+
+def Percentile(Values, Fraction):
+    # Returns the value below which the given fraction of the sorted values fall
+    return Values[min(len(Values) - 1, int(Fraction * len(Values)))]
+
+
+def Time(Version, Species, Mode, Count, Seed=0):
+    """
+    This function generates Count exercises for a given version, species, and mode, timing each one, and returns the times
+    along with the number of exercises that failed to find a pitch.  The same seed is used every time, so the same exercises
+    are generated on every run and only the speed of the code changes.
+    """
+
+    Times = []
+    Failures = 0
+
+    EX = Exercise(Version, Species, Mode, Seed, Generate=False)
+    for n in range(Count):
+        Start = perf_counter()
+        EX.Generate(Version)
+        Times.append(perf_counter() - Start)
+
+        if "NotFound" in EX.Rules:
+            Failures += 1
+
+    return Times, Failures
+
+
+def Summarize(Passes, Failures):
+    """
+    This function turns several timed passes over the same exercises into a result.  The throughput is taken from the fastest
+    pass, and each exercise is given the best of its times, since anything else running on the machine can only ever make an
+    exercise slower.
+    """
+
+    Count = len(Passes[0])
+    Latencies = sorted(min(Times) for Times in zip(*Passes))
+    return {
+        "Count": Count,
+        "ExercisesPerSecond": Count / min(sum(Times) for Times in Passes),
+        "LatencyP50": Percentile(Latencies, 0.50),
+        "LatencyP90": Percentile(Latencies, 0.90),
+        "LatencyP99": Percentile(Latencies, 0.99),
+        "FallbackRate": Failures / Count
+    }
+
+
+def Measure(Version, Species, Mode, Count, Seed=0, Repeats=5):
+    """
+    This function measures a single version, species, and mode.  The exercises are first generated once untimed, to fill the
+    caches of the machine and of the algorithms, and then timed Repeats times over.
+    """
+
+    Failures = Time(Version, Species, Mode, Count, Seed)[1]
+    return Summarize([Time(Version, Species, Mode, Count, Seed)[0] for Repeat in range(Repeats)], Failures)
+
+
+def RunBenchmarks(Count, Versions=None, Repeats=5):
+    """
+    This function measures every version for every species and mode.  The results are keyed by a name such as
+    'FirstIteration/1/Dorian'.
+
+    Every combination is generated once untimed, and then the whole set is timed Repeats times over, rather than each
+    combination Repeats times in a row.  A machine is often slowed for a few seconds at a time by something else, which would
+    slow every pass of one combination alike if they were taken together, but only one of its passes when they are spread out.
+    """
+
+    Names = {}
+    for Version in Versions or Exercise.Versions:
+        for Species in Exercise.PossibleSpecies:
+            for Mode in CantusFirmus.Modes:
+                Names[Version + "/" + str(Species) + "/" + Mode] = (Version, Species, Mode)
+
+    with open(os.devnull, "w") as Silence, redirect_stdout(Silence):
+        Failures = {Name: Time(*Combination, Count)[1] for Name, Combination in Names.items()}
+        Passes = {Name: [] for Name in Names}
+        for Repeat in range(Repeats):
+            for Name, Combination in Names.items():
+                Passes[Name].append(Time(*Combination, Count)[0])
+
+    return {Name: Summarize(Passes[Name], Failures[Name]) for Name in Names}
+
+
+def Instrument(Count, Versions=None):
+    """
+    This function generates the same exercises as RunBenchmarks with instrumentation turned on, and returns the summary of
+    where each version spent its time.  It is kept apart from the timed runs, since measuring slows the algorithms down.
+    """
+
+    from Instrumentation import Instrumentation
+    Exercise.Instrumentation = Instrumentation()
+    try:
+        with open(os.devnull, "w") as Silence, redirect_stdout(Silence):
+            for Version in Versions or Exercise.Versions:
+                for Species in Exercise.PossibleSpecies:
+                    for Mode in CantusFirmus.Modes:
+                        EX = Exercise(Version, Species, Mode, 0)
+                        for n in range(Count - 1):
+                            EX.Generate(Version)
+        return Exercise.Instrumentation.Summary()
+    finally:
+        Exercise.Instrumentation = None
+
+
+# Timings of fewer exercises than this are too noisy to be called regressions, and the same goes for the tail latencies of
+# fewer than TailCount exercises
+MinimumCount = 20
+TailCount = 100
+
+
+def FindRegressions(Results, Baseline, Threshold):
+    """
+    This function compares a set of results against a baseline and returns a description of every measurement that has become
+    worse by more than the threshold (given as a fraction, so 0.1 means ten percent).  Throughput regresses when it falls,
+    latency when it rises, and the fallback rate regresses whenever it rises by more than the threshold in absolute terms.
+
+    Timings are only compared where both the results and the baseline timed at least MinimumCount exercises, and the 90th and
+    99th percentiles only where both timed at least TailCount, since with fewer they are a single slow exercise.  The fallback
+    rate does not depend on timing, so it is always compared.
+    """
+
+    Regressions = []
+    for Name, Result in Results.items():
+        if Name not in Baseline:
+            continue
+        Old = Baseline[Name]
+
+        if Result["FallbackRate"] > Old["FallbackRate"] + Threshold:
+            Regressions.append(Name + ": fallback rate rose from %.3f to %.3f" % (Old["FallbackRate"], Result["FallbackRate"]))
+
+        # Baselines saved before the count was recorded are taken to be too small to compare
+        Count = min(Result.get("Count", 0), Old.get("Count", 0))
+        if Count < MinimumCount:
+            continue
+
+        if Result["ExercisesPerSecond"] < Old["ExercisesPerSecond"] * (1 - Threshold):
+            Regressions.append(Name + ": throughput fell from %.0f to %.0f exercises/s" % (Old["ExercisesPerSecond"], Result["ExercisesPerSecond"]))
+
+        for Latency in ["LatencyP50", "LatencyP90", "LatencyP99"] if Count >= TailCount else ["LatencyP50"]:
+            if Result[Latency] > Old[Latency] * (1 + Threshold):
+                Regressions.append(Name + ": %s rose from %.1f to %.1f us" % (Latency, Old[Latency] * 1e6, Result[Latency] * 1e6))
+
+    return Regressions
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Benchmark every version of the counterpoint algorithm.")
+    Parser.add_argument("--count", type=int, default=200, help="the number of exercises to time for each version, species, and mode")
+    Parser.add_argument("--repeats", type=int, default=5, help="the number of timed passes after one untimed pass, of which each exercise is given its best time")
+    Parser.add_argument("--version", action="append", choices=Exercise.Versions, help="only benchmark the given version (may be repeated)")
+    Parser.add_argument("--baseline", default="BenchmarkBaseline.json", help="the file the baseline results are kept in")
+    Parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    Parser.add_argument("--threshold", type=float, default=0.2, help="the fraction by which a result may worsen before it is flagged")
+    Parser.add_argument("--instrument", metavar="FILE", help="also count where each version spends its time, and write the counts to this file as JSON")
+    Arguments = Parser.parse_args()
+
+    if Arguments.repeats < 1:
+        Parser.error("--repeats must be at least 1")
+
+    Results = RunBenchmarks(Arguments.count, Arguments.version, Arguments.repeats)
+
+    print("%-36s %12s %10s %10s %10s %9s" % ("Benchmark", "Exercises/s", "P50 (us)", "P90 (us)", "P99 (us)", "Fallback"))
+    for Name, Result in Results.items():
+        print("%-36s %12.0f %10.1f %10.1f %10.1f %9.3f" % (Name, Result["ExercisesPerSecond"], Result["LatencyP50"] * 1e6,
+                                                         Result["LatencyP90"] * 1e6, Result["LatencyP99"] * 1e6, Result["FallbackRate"]))
+
+    if Arguments.instrument:
+        with open(Arguments.instrument, "w") as File:
+            json.dump(Instrument(Arguments.count, Arguments.version), File, indent=4)
+        print("Instrumentation written to " + Arguments.instrument)
+
+    if Arguments.save:
+        with open(Arguments.baseline, "w") as File:
+            json.dump(Results, File, indent=4)
+        print("Baseline saved to " + Arguments.baseline)
+
+    elif os.path.exists(Arguments.baseline):
+        with open(Arguments.baseline) as File:
+            Baseline = json.load(File)
+
+        Regressions = FindRegressions(Results, Baseline, Arguments.threshold)
+        for Regression in Regressions:
+            print("REGRESSION " + Regression)
+
+        if Regressions:
+            raise SystemExit(1)
+        print("No regressions against " + Arguments.baseline)
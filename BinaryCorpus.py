@@ -0,0 +1,186 @@
+"""
+This file defines a binary format for corpora of counterpoint exercises, for corpora far too large for JSON.  Every pitch is
+stored as a single byte, and the file is read by mapping it into memory rather than loading it, so a corpus larger than the
+memory of the machine can still be scanned, and any exercise can be found without reading the ones before it.
+
+A corpus file is laid out as follows, with every number little-endian:
+
+Header      the eight bytes 'CPCORPUS', then the format version, the number of exercises, and the offsets of the index and of
+            the metadata, as described by HeaderFormat
+Rows        for each exercise, its cantus followed by its counterpoint, one signed byte per pitch
+Index       for each exercise, the offset of its row, the length of its cantus, and the numbers of its version, species, and
+            mode, as described by IndexType
+Metadata    a JSON object holding the names of the versions and modes, in the order they are numbered in the index
+
+Cantus firmi differ in length (the Phrygian cantus has ten pitches and the Mixolydian fourteen), so rows are found through the
+index rather than by their position.
+"""
+
+# The file is mapped into memory and its rows handed out as NumPy arrays
+import numpy
+
+# The header is packed by hand once the corpus is finished
+import struct
+import json
+import shutil
+import tempfile
+
+
+Magic = b"CPCORPUS"
+FormatVersion = 1
+
+# The magic bytes, the format version, the number of exercises, and the offset of the index, and of the metadata and its length
+HeaderFormat = "<8sIIQQQQ"
+HeaderSize = struct.calcsize(HeaderFormat)
+
+# Each entry of the index is sixteen bytes long
+IndexType = numpy.dtype({
+    "names": ["Offset", "Length", "Version", "Species", "Mode"],
+    "formats": ["<u8", "<u2", "u1", "u1", "u1"],
+    "offsets": [0, 8, 10, 11, 12],
+    "itemsize": 16
+})
+
+
+class BinaryCorpusWriter():
+    """
+    This class writes a corpus one exercise, or one batch of exercises, at a time.  The rows are written straight to the file
+    and the index to a temporary file, which is copied onto the end of the corpus when it is closed, so the corpus is never
+    held in memory.  The writer can be used in a 'with' statement, so that the corpus is always finished.
+    """
+
+    def __init__(self, Path):
+        self.File = open(Path, "wb")
+        self.Index = tempfile.TemporaryFile()
+        self.Count = 0
+        self.Versions = []
+        self.Modes = []
+
+        # The header is written again once the index and metadata have been placed
+        self.File.write(b"\0" * HeaderSize)
+
+    def Number(self, Names, Name):
+        # Returns the number of a version or mode, numbering it if it is new
+        if Name not in Names:
+            Names.append(Name)
+        return Names.index(Name)
+
+    def Write(self, Version, Species, Mode, Counterpoint, Cantus):
+        # Writes a single exercise, given in the same order as for Graph
+        self.WriteBatch(Version, Species, Mode, [Counterpoint], Cantus)
+
+    def WriteBatch(self, Version, Species, Mode, Lines, Cantus):
+        """
+        This function writes a batch of exercises that share a version, species, mode, and cantus, such as those returned by
+        Exercise.Batch, with one counterpoint to each row of Lines.
+        """
+
+        Lines = numpy.asarray(Lines, dtype=numpy.int8)
+        Length = len(Cantus)
+        Rows = numpy.empty((len(Lines), 2, Length), dtype=numpy.int8)
+        Rows[:, 0] = numpy.asarray(Cantus, dtype=numpy.int8)
+        Rows[:, 1] = Lines
+
+        Offset = self.File.tell()
+        self.File.write(Rows.tobytes())
+
+        Entries = numpy.zeros(len(Lines), dtype=IndexType)
+        Entries["Offset"] = Offset + numpy.arange(len(Lines), dtype=numpy.uint64) * (2 * Length)
+        Entries["Length"] = Length
+        Entries["Version"] = self.Number(self.Versions, Version)
+        Entries["Species"] = Species
+        Entries["Mode"] = self.Number(self.Modes, Mode)
+        self.Index.write(Entries.tobytes())
+        self.Count += len(Lines)
+
+    def Close(self):
+        # Copies the index and metadata onto the end of the file, and writes the header that points to them
+        IndexOffset = self.File.tell()
+        self.Index.seek(0)
+        shutil.copyfileobj(self.Index, self.File)
+        self.Index.close()
+
+        Metadata = json.dumps({"Versions": self.Versions, "Modes": self.Modes}).encode()
+        MetadataOffset = self.File.tell()
+        self.File.write(Metadata)
+
+        self.File.seek(0)
+        self.File.write(struct.pack(HeaderFormat, Magic, FormatVersion, 0, self.Count, IndexOffset, MetadataOffset, len(Metadata)))
+        self.File.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Exception):
+        self.Close()
+
+
+class BinaryCorpus():
+    """
+    This class reads a corpus written by BinaryCorpusWriter.  The file is mapped into memory, and every array it hands out is a
+    read-only view of the mapped file rather than a copy, so only the parts of the corpus that are actually read are ever
+    loaded.
+
+    Indexing the corpus gives an exercise as (Version, Species, Mode, Counterpoint, Cantus), in the same order as for Graph.  The
+    index itself can be read from the Index attribute, which has one field for each column of IndexType, so that exercises can
+    be chosen by version, species, or mode without reading any rows.
+    """
+
+    def __init__(self, Path):
+        self.Data = numpy.memmap(Path, dtype=numpy.int8, mode="r")
+
+        Header = struct.unpack(HeaderFormat, self.Data[:HeaderSize].tobytes())
+        if Header[0] != Magic or Header[1] != FormatVersion:
+            raise ValueError(Path + " is not a corpus of format version " + str(FormatVersion))
+        self.Count, IndexOffset, MetadataOffset, MetadataLength = Header[3:]
+
+        self.Index = numpy.frombuffer(self.Data, dtype=IndexType, count=self.Count, offset=IndexOffset)
+        Metadata = json.loads(self.Data[MetadataOffset:MetadataOffset + MetadataLength].tobytes())
+        self.Versions = Metadata["Versions"]
+        self.Modes = Metadata["Modes"]
+
+    def __len__(self):
+        return self.Count
+
+    def __getitem__(self, n):
+        Entry = self.Index[n]
+        Row = self.Data[Entry["Offset"]:Entry["Offset"] + 2 * Entry["Length"]]
+        Length = int(Entry["Length"])
+        return self.Versions[Entry["Version"]], int(Entry["Species"]), self.Modes[Entry["Mode"]], Row[Length:], Row[:Length]
+
+    def __iter__(self):
+        for n in range(self.Count):
+            yield self[n]
+
+    def Select(self, Version=None, Species=None, Mode=None):
+        # Returns the numbers of the exercises of a given version, species, and mode, leaving out any that are not given
+        Chosen = numpy.ones(self.Count, dtype=bool)
+        if Version is not None:
+            Chosen &= self.Index["Version"] == self.Versions.index(Version)
+        if Species is not None:
+            Chosen &= self.Index["Species"] == Species
+        if Mode is not None:
+            Chosen &= self.Index["Mode"] == self.Modes.index(Mode)
+        return numpy.flatnonzero(Chosen)
+
+    def Block(self, Start, Stop):
+        """
+        This function returns the exercises from Start up to Stop as a pair of two dimensional arrays, the counterpoints and
+        the cantus firmi, with one row per exercise, ready for Validator.Validate.  The exercises must have been written one
+        after another with cantus firmi of the same length, as every batch written by WriteBatch is; the arrays are then views
+        of the mapped file rather than copies.
+        """
+
+        Entries = self.Index[Start:Stop]
+        Length = int(Entries["Length"][0])
+        if (Entries["Length"] != Length).any() or (numpy.diff(Entries["Offset"].astype(numpy.int64)) != 2 * Length).any():
+            raise ValueError("exercises %d to %d are not stored one after another with the same length" % (Start, Stop))
+
+        First = int(Entries["Offset"][0])
+        Rows = self.Data[First:First + len(Entries) * 2 * Length].reshape(len(Entries), 2, Length)
+        return Rows[:, 1], Rows[:, 0]
+
+    def Close(self):
+        # Lets go of the mapping of the file, which is released once no views of it are left
+        self.Index = None
+        self.Data = None
@@ -14,6 +14,12 @@ class CantusFirmus():
         "Aeolian": [21, 24, 23, 26, 24, 28, 29, 28, 26, 24, 23, 21]
     }
 
+    # The number of times each pitch of the cantus is repeated for each species
+    Repeats = {1: 1, 2: 2, 3: 2, 4: 4, 5: 4}
+
+    # Every expanded cantus that has been asked for is kept here, keyed by species and mode, so it is only ever made once
+    Expanded = {}
+
     def GetCantus(self, Species, Mode):
         """
         This function returns the cantus firmus as needed for a given species.  The caller can specify which species and
@@ -22,47 +28,16 @@ class CantusFirmus():
         For 2/1 or 4/1 counterpoint, the cantus defined above will need to be expanded to accomodate the larger number of 
         pitches.  Rather than associate four counterpoint pitches with one cantus pitch in a 4/1 exercise, the cantus pitch
         will be repeated four times, allowing each counterpoint pitch to be associated with a single cantus pitch.
-        """
-
-        # Pull the desired cantus from the dictionary defined aboe
-        Cantus = self.Modes[Mode]
 
-        # Expand the cantus to reflect the species
-        if Species == 1:
-            return Cantus
-
-        elif Species == 2:
-            NewCantus = []
-            for each in Cantus:
-                # Double each pitch
-                NewCantus.append(each)
-                NewCantus.append(each)
-            return NewCantus
-
-        elif Species == 3:
-            NewCantus = []
-            for each in Cantus:
-                # Double eahc pitch
-                NewCantus.append(each)
-                NewCantus.append(each)
-            return NewCantus
+        The expanded cantus is returned as a tuple, so that it can never change underneath its users, and the same tuple is
+        handed to every caller asking for the same species and mode.
+        """
 
-        elif Species == 4:
-            NewCantus = []
-            for each in Cantus:
-                # Quadruple each pitch
-                NewCantus.append(each)
-                NewCantus.append(each)
-                NewCantus.append(each)
-                NewCantus.append(each)
-            return NewCantus
+        if (Species, Mode) not in self.Expanded:
+            Expanded = []
+            for each in self.Modes[Mode]:
+                # Repeat each pitch once for every counterpoint pitch sounded against it
+                Expanded.extend([each] * self.Repeats[Species])
+            self.Expanded[Species, Mode] = tuple(Expanded)
 
-        elif Species == 5:
-            NewCantus = []
-            for each in Cantus:
-                # Quadruple each pitch
-                NewCantus.append(each)
-                NewCantus.append(each)
-                NewCantus.append(each)
-                NewCantus.append(each)
-            return NewCantus
\ No newline at end of file
+        return self.Expanded[Species, Mode]
@@ -0,0 +1,194 @@
+"""
+This file holds checks that the generators do what they claim to, which are too slow or too thorough to run every time an
+exercise is generated.  Each check works the answer out again the slow, obvious way and compares it with what the fast code
+gives, so that the claims can be checked again after any change.  Run it with the names of the checks to run, or with none to
+run them all; it exits with an error if any check fails.
+"""
+
+# The checks are run from the command line
+import sys
+import io
+import os
+import json
+import tempfile
+from contextlib import redirect_stdout
+from argparse import ArgumentParser
+
+from Counterpoint import Exercise
+from CantusFirmi import CantusFirmus
+
+
+def Quietly(Version, Species, Mode, Seed):
+    # Creates an exercise, keeping the "Failed to find a pitch" messages of the generators out of the results
+    with redirect_stdout(io.StringIO()):
+        return Exercise(Version, Species, Mode, Seed)
+
+
+def LineCost(EX, Line):
+    # Returns the cost of a whole line, the sum of the costs of its moves, as BeamIteration and OptimalIteration count it
+    return sum(EX.TransitionCost(i, Line[i - 1] if i > 0 else None, Pitch) for i, Pitch in enumerate(Line))
+
+
+def FollowsRules(EX, Line):
+    # Checks every move of a line against DynamicIterationRules itself, rather than the table of legal moves
+    return all(EX.DynamicIterationRules(i, Line[i - 1] if i > 0 else None, Pitch) for i, Pitch in enumerate(Line))
+
+
+def ExhaustiveMinimum(EX):
+    """
+    This function returns the cost of the cheapest line against the exercise's cantus, or None if there is no line at all.
+    Every pitch at every position is tried after every pitch at the position before it, keeping only the cheapest cost of
+    reaching each pitch, so nothing is estimated and the table of legal moves is never used.
+    """
+
+    Best = {Pitch: EX.TransitionCost(0, None, Pitch) for Pitch in EX.AllowedPitches(0)}
+    for i in range(1, len(EX.Cantus)):
+        Reached = {}
+        for Pitch in EX.AllowedPitches(i):
+            Costs = [Cost + EX.TransitionCost(i, Previous, Pitch) for Previous, Cost in Best.items() if EX.DynamicIterationRules(i, Previous, Pitch)]
+            if Costs:
+                Reached[Pitch] = min(Costs)
+        Best = Reached
+
+    return min(Best.values()) if Best else None
+
+
+def CheckOptimal(Seeds=3):
+    """
+    OptimalIteration claims to find a cheapest line.  For every species and mode, and a few seeds (which only change how ties
+    are broken), its line must follow the rules and cost exactly as much as the exhaustive minimum.
+    """
+
+    Passed = True
+    for Species in Exercise.PossibleSpecies:
+        for Mode in CantusFirmus.Modes:
+            for Seed in range(Seeds):
+                EX = Quietly("OptimalIteration", Species, Mode, Seed)
+                Minimum = ExhaustiveMinimum(EX)
+                Cost = LineCost(EX, EX.Counterpoint) if FollowsRules(EX, EX.Counterpoint) else None
+
+                if Cost != Minimum:
+                    print("Species %d in %s, seed %d: OptimalIteration costs %s, the minimum is %s" % (Species, Mode, Seed, Cost, Minimum))
+                    Passed = False
+
+    return Passed
+
+
+def CheckBinaryCorpus(Count=5, Seed=1):
+    """
+    A binary corpus claims to hold exactly what a JSON corpus does.  Two corpora are written from the same seed, one in each
+    format, and every exercise of the binary corpus must match the JSON one: the same version, species, mode, cantus, and
+    counterpoint, in the same order.  The exercises of each batch must also be readable as a single Block.
+    """
+
+    from Corpus import GenerateCorpus
+    from BinaryCorpus import BinaryCorpus
+
+    with tempfile.TemporaryDirectory() as Directory:
+        JsonPath = os.path.join(Directory, "Corpus.jsonl")
+        BinaryPath = os.path.join(Directory, "Corpus.bin")
+
+        with redirect_stdout(io.StringIO()):
+            GenerateCorpus(JsonPath, Count, Count, Seed=Seed)
+            GenerateCorpus(BinaryPath, Count, Count, Seed=Seed, Binary=True)
+
+        with open(JsonPath) as File:
+            Expected = [json.loads(Line) for Line in File]
+
+        Corpus = BinaryCorpus(BinaryPath)
+        Passed = len(Corpus) == len(Expected)
+        if not Passed:
+            print("The binary corpus holds %d exercises, the JSON corpus %d" % (len(Corpus), len(Expected)))
+
+        for n, (Record, (Version, Species, Mode, Counterpoint, Cantus)) in enumerate(zip(Expected, Corpus)):
+            Found = {"Version": Version, "Species": Species, "Mode": Mode, "Cantus": Cantus.tolist(), "Counterpoint": Counterpoint.tolist()}
+            if Found != Record:
+                print("Exercise %d differs: %r in the binary corpus, %r in the JSON corpus" % (n, Found, Record))
+                Passed = False
+
+        for Start in range(0, len(Corpus), Count):
+            Lines, Cantus = Corpus.Block(Start, Start + Count)
+            if Lines.tolist() != [Record["Counterpoint"] for Record in Expected[Start:Start + Count]]:
+                print("The block of exercises from %d differs from the JSON corpus" % Start)
+                Passed = False
+
+        Corpus.Close()
+
+    return Passed
+
+
+def AllLines(EX):
+    """
+    This function returns every line that follows the rules against the exercise's cantus, found by trying every allowed pitch
+    after every line so far, using DynamicIterationRules rather than the counts or the table of legal moves.
+    """
+
+    Lines = [[Pitch] for Pitch in EX.AllowedPitches(0)]
+    for i in range(1, len(EX.Cantus)):
+        Allowed = EX.AllowedPitches(i)
+        Lines = [Line + [Pitch] for Line in Lines for Pitch in Allowed if EX.DynamicIterationRules(i, Line[-1], Pitch)]
+    return [tuple(Line) for Line in Lines]
+
+
+def CheckUniform(Mode="Phrygian", Draws=100000, Seed=0):
+    """
+    UniformIteration claims to choose every line that follows the rules with the same probability, and CountSolutions to count
+    them exactly.  Every line in first species is listed one by one, and there must be as many as CountSolutions says.  Draws
+    lines are then chosen with UniformIteration, each of which must be one of those listed, and the number of times each line
+    is chosen must fit an even spread: the chi-squared statistic may be no more than four standard deviations from what an
+    even spread would give.
+    """
+
+    EX = Quietly("UniformIteration", 1, Mode, Seed)
+    Lines = AllLines(EX)
+    Counted = EX.CountSolutions()
+    if len(Lines) != Counted:
+        print("%d lines were listed in %s, but CountSolutions counts %d" % (len(Lines), Mode, Counted))
+        return False
+
+    Chosen = dict.fromkeys(Lines, 0)
+    for n in range(Draws):
+        if n > 0:
+            EX.Generate("UniformIteration")
+        Line = tuple(EX.Counterpoint)
+        if Line not in Chosen:
+            print("UniformIteration chose %r, which does not follow the rules" % (Line,))
+            return False
+        Chosen[Line] += 1
+
+    Expected = Draws / len(Lines)
+    ChiSquared = sum((Times - Expected) ** 2 / Expected for Times in Chosen.values())
+    Freedom = len(Lines) - 1
+    Deviations = (ChiSquared - Freedom) / (2 * Freedom) ** 0.5
+    if abs(Deviations) > 4:
+        print("The %d lines in %s were not chosen evenly: chi-squared is %.1f with %d degrees of freedom" % (len(Lines), Mode, ChiSquared, Freedom))
+        return False
+
+    return True
+
+
+# The checks that can be run, by name
+Checks = {
+    "Optimal": CheckOptimal,
+    "BinaryCorpus": CheckBinaryCorpus,
+    "Uniform": CheckUniform
+}
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Check that the generators do what they claim to.")
+    Parser.add_argument("Checks", nargs="*", help="the checks to run, out of " + ", ".join(Checks) + " (all of them by default)")
+    Arguments = Parser.parse_args()
+
+    for Name in Arguments.Checks:
+        if Name not in Checks:
+            Parser.error("unknown check " + repr(Name))
+
+    Failed = []
+    for Name in Arguments.Checks or list(Checks):
+        Passed = Checks[Name]()
+        print(Name + (": passed" if Passed else ": FAILED"))
+        if not Passed:
+            Failed.append(Name)
+
+    sys.exit(1 if Failed else 0)
@@ -0,0 +1,131 @@
+"""
+This file generates a large corpus of counterpoint exercises without any interaction.  Every version of the algorithm is run
+for every species and every mode, and the work is spread across all of the processors of the machine.
+"""
+
+# The exercises are written to disk as JSON, one exercise per line
+import json
+
+# The work is split between several processes
+from multiprocessing import Pool
+
+# The "Failed to find a pitch" messages of the workers are kept out of the corpus summary
+import os
+from contextlib import redirect_stdout
+
+# Every chunk of work is given its own independent stream of random numbers
+from numpy.random import SeedSequence
+
+# The corpus is generated from the command line
+from argparse import ArgumentParser, ArgumentTypeError
+
+# The exercises themselves come from the Counterpoint class, against the cantus firmi defined in CantusFirmi.py
+from Counterpoint import Exercise
+from CantusFirmi import CantusFirmus
+
+
+def NonNegativeInteger(Text):
+    # Reads a command line argument that must be a whole number of at least zero, as a SeedSequence needs
+    Value = int(Text)
+    if Value < 0:
+        raise ArgumentTypeError("must not be negative, not " + Text)
+    return Value
+
+
+def PositiveInteger(Text):
+    # Reads a command line argument that must be a whole number of at least one
+    Value = int(Text)
+    if Value < 1:
+        raise ArgumentTypeError("must be at least 1, not " + Text)
+    return Value
+
+
+def WorkUnits(Count, ChunkSize, Seed=None, BeamWidth=None):
+    """
+    This function splits the corpus into chunks of work.  Each chunk is a number of exercises for a single version, species,
+    and mode, so that a worker can generate it as one batch.
+
+    Each chunk is also given a seed of its own, spawned from Seed by the chunk's place in the corpus.  The streams of random
+    numbers never overlap, and the same Seed always gives the same chunks no matter which worker generates them.  Every chunk
+    carries the same BeamWidth.
+    """
+    Index = 0
+    for Version in Exercise.Versions:
+        for Species in Exercise.PossibleSpecies:
+            for Mode in CantusFirmus.Modes:
+                for Start in range(0, Count, ChunkSize):
+                    ChunkSeed = int(SeedSequence(Seed, spawn_key=(Index,)).generate_state(1)[0])
+                    yield Version, Species, Mode, min(ChunkSize, Count - Start), ChunkSeed, BeamWidth
+                    Index += 1
+
+
+def GenerateChunk(Unit):
+    # Generates a single chunk of work in a worker process
+    Version, Species, Mode, Size, Seed, BeamWidth = Unit
+    with open(os.devnull, "w") as Silence, redirect_stdout(Silence):
+        Lines = Exercise.Batch(Version, Species, Mode, Size, Seed, BeamWidth)
+    return Version, Species, Mode, Lines.tolist()
+
+
+def GenerateCorpus(Path, Count, ChunkSize=100, Processes=None, Seed=None, Binary=False, BeamWidth=None):
+    """
+    This function generates Count exercises for every combination of version, species, and mode and writes them to the file
+    at Path.  Chunks are written as soon as any worker finishes them, so the corpus never needs to be held in memory.  By
+    default one worker is started for each processor.  It returns the number of exercises written.
+
+    If a Seed is given, the chunks are written in the order of the corpus rather than the order they finish in, so the same
+    seed always writes exactly the same file.
+
+    If Binary is set, the corpus is written in the format defined in BinaryCorpus.py rather than as JSON.  BeamWidth is the
+    number of partial lines kept by BeamIteration, the exercise's default if it is None.
+    """
+
+    # The cantus is the same for every exercise of a given species and mode, so it is only expanded once
+    CF = CantusFirmus()
+    Cantus = {}
+    for Species in Exercise.PossibleSpecies:
+        for Mode in CF.Modes:
+            Cantus[Species, Mode] = list(CF.GetCantus(Species, Mode))
+
+    if Binary:
+        from BinaryCorpus import BinaryCorpusWriter
+
+    Written = 0
+    with Pool(Processes) as Workers, (BinaryCorpusWriter(Path) if Binary else open(Path, "w")) as File:
+        if Seed is None:
+            Chunks = Workers.imap_unordered(GenerateChunk, WorkUnits(Count, ChunkSize, None, BeamWidth))
+        else:
+            Chunks = Workers.imap(GenerateChunk, WorkUnits(Count, ChunkSize, Seed, BeamWidth))
+
+        for Version, Species, Mode, Lines in Chunks:
+            if Binary:
+                File.WriteBatch(Version, Species, Mode, Lines, Cantus[Species, Mode])
+                Written += len(Lines)
+                continue
+
+            for Line in Lines:
+                File.write(json.dumps({
+                    "Version": Version,
+                    "Species": Species,
+                    "Mode": Mode,
+                    "Cantus": Cantus[Species, Mode],
+                    "Counterpoint": Line
+                }) + "\n")
+            Written += len(Lines)
+
+    return Written
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Generate a corpus of counterpoint exercises for every version, species, and mode.")
+    Parser.add_argument("Output", help="the file to write the exercises to, one JSON object per line")
+    Parser.add_argument("--count", type=int, default=100, help="the number of exercises for each version, species, and mode")
+    Parser.add_argument("--chunk", type=int, default=100, help="the number of exercises in each unit of work")
+    Parser.add_argument("--processes", type=int, default=None, help="the number of worker processes (one per processor by default)")
+    Parser.add_argument("--seed", type=NonNegativeInteger, default=None, help="a seed that makes the corpus reproducible")
+    Parser.add_argument("--width", type=PositiveInteger, default=None, help="the number of partial lines kept by BeamIteration (%d by default)" % Exercise.BeamWidth)
+    Parser.add_argument("--binary", action="store_true", help="write the corpus in the binary format of BinaryCorpus.py rather than as JSON")
+    Arguments = Parser.parse_args()
+
+    Written = GenerateCorpus(Arguments.Output, Arguments.count, Arguments.chunk, Arguments.processes, Arguments.seed, Arguments.binary, Arguments.width)
+    print(str(Written) + " exercises written to " + Arguments.Output)
@@ -10,38 +10,289 @@ from MusicFundamentals import Fundamentals
 from CantusFirmi import CantusFirmus
 
 # A random number generator will also be needed for the computer to make 'choices'
-from random import randint
+from random import Random
+
+# The table of legal moves is kept on disk as JSON, next to this file
+import os
+import json
+
+# OptimalIteration keeps the partial lines it has yet to explore in a priority queue
+from heapq import heapify, heappush, heappop
+
+def RandomSource(Seed=None):
+    """
+    This function turns a seed into a random number generator for an exercise.  The seed can be a number (or None for an
+    unpredictable seed), a random.Random instance, which is used as it is, or a NumPy Generator or SeedSequence, from which a
+    new random.Random is seeded so that independent streams spawned for each worker stay independent.
+    """
+    if isinstance(Seed, Random):
+        return Seed
+    elif hasattr(Seed, "integers"):
+        return Random(int(Seed.integers(2 ** 62)))
+    elif hasattr(Seed, "generate_state"):
+        return Random(int(Seed.generate_state(1)[0]))
+    else:
+        return Random(Seed)
+
 
 class Exercise():
     # This initiates the Fundamentals class
     fundamentals = Fundamentals()
 
-    def __init__(self, Version, Species, Mode):
+    # These are the versions of the algorithm that can be used to generate an exercise, and the species they support
+    Versions = ["FirstIteration", "SecondIteration", "ThirdIteration", "FourthIteration", "FifthIteration", "DynamicIteration", "UniformIteration", "BeamIteration", "OptimalIteration", "StrictIteration"]
+    PossibleSpecies = [1, 2, 3, 4, 5]
+
+    # The number of partial lines BeamIteration keeps at each position.  Wider beams find better lines but take longer.
+    BeamWidth = 8
+
+    # The cost of each kind of move, used by BeamIteration to rank lines.  The order of preference is the one followed by the
+    # later iterations: stepwise motion, imperfect consonances, and contrary motion are preferred, and leaps cost more the
+    # larger they are.
+    Costs = {
+        "Perfect": 2,
+        "Repeat": 3,
+        "Third": 1,
+        "Leap": 4,
+        "LeapPerHalfStep": 1,
+        "Oblique": 1,
+        "Similar": 2
+    }
+
+    # The version of the rules followed by DynamicIterationRules and the costs above.  Anything worked out from them and kept
+    # between runs is stored along with this number, and thrown away when it changes, so it must be raised whenever the rules
+    # or the costs are changed.
+    RuleSetVersion = 1
+
+    # The legal moves for every mode, loaded from the file at TransitionPath (or worked out and saved there) when first needed.
+    # A relative path is taken from the working directory, as for ExerciseCache, so nothing is ever written next to this file.
+    # If TransitionPath is None, the moves are worked out afresh by every program and never saved.
+    TransitionPath = "TransitionCache.json"
+    Transitions = {}
+
+    # An ExerciseCache can be set here, in which case exercises with a numeric seed are looked up in it before being generated.
+    # Only the versions that take far longer to generate a line than to read one back are cached.
+    Cache = None
+    CachedVersions = ["BeamIteration", "OptimalIteration"]
+
+    # An Instrumentation can be set here, in which case every exercise is measured as it is generated (see Instrumentation.py)
+    Instrumentation = None
+
+    def __init__(self, Version, Species, Mode, Seed=None, BeamWidth=None, Generate=True):
+        """
+        The exercise generates its first line as soon as it is created, unless Generate is False, in which case nothing is
+        generated until Stream or Generate is called.  The first line is then the same one the seed would have given at once,
+        so a caller can stream it pitch by pitch from the very first note.
+        """
+
+        # A beam width given for this exercise takes the place of the usual one
+        if BeamWidth is not None:
+            if BeamWidth < 1:
+                raise ValueError("the beam width must be at least 1, not " + str(BeamWidth))
+            self.BeamWidth = BeamWidth
+
+        # Every exercise makes its 'choices' with its own random number generator, so that exercises generated side by side
+        # never share any state and the same seed always gives the same exercise
+        self.Random = RandomSource(Seed)
+
         # This empty variable will eventually be filled with the pitches of a contrapuntal line
         self.Counterpoint = []
 
+        # This empty variable will eventually be filled with the names of the rules that chose each counterpoint pitch
+        self.Rules = []
+
         # This empty variable will eventually be filled with the pitches of a cantus firmus
         self.Cantus = []
 
+        # The mode decides which table of legal moves is used, and the species, mode, and seed are what an exercise is cached by
+        self.Species = Species
+        self.Mode = Mode
+        self.Seed = Seed
+
         # Initialize the Cantus Firmi class
         CF = CantusFirmus()
         self.Cantus = CF.GetCantus(Species, Mode)
 
+        # This keeps track of what the rules need to know about the counterpoint as each pitch is added to it
+        self.State = RuleState(self.Cantus)
+
+        # The number of lines generated so far, and the versions of those read from the cache, whose choices the random number
+        # generator has yet to make
+        self.Lines = 0
+        self.Behind = []
+
+        # The measurements of the last line generated, when instrumentation has been asked for and the line was not read
+        # from the cache
+        self.Metrics = None
+
+        # Generate a contrapuntal line against the cantus, unless the caller will stream it
+        if Generate:
+            self.Generate(Version)
+
+    def Generate(self, Version):
+        # Runs the stream to the end, leaving the finished line in self.Counterpoint
+        for Step in self.Stream(Version):
+            pass
+
+    def Stream(self, Version):
+        """
+        This function generates a contrapuntal line one pitch at a time.  As soon as the pitch at a position has been chosen,
+        it yields the position, the cantus pitch, the counterpoint pitch, and the name of the rule that chose it, so that
+        playback or graphing can begin on the first notes while the rest of the line is still being generated.  To stream the
+        first line of an exercise, create it with Generate=False, since otherwise it has already been generated.
+
+        A line read from the cache has its rules read back with it, but is never measured, so it leaves Metrics empty rather
+        than holding the measurements of the line before it.
+        """
+
+        Key = self.CacheKey(Version)
+        self.Lines += 1
+        self.Metrics = None
+
+        if Key is not None:
+            Found = self.Cache.Get(*Key)
+            if Found is not None:
+                self.Clear()
+                for Pitch, Rule in zip(Found[1], Found[2]):
+                    self.Append(Pitch, Rule)
+                self.Behind.append(Version)
+
+                for i in range(len(self.Cantus)):
+                    yield i, self.Cantus[i], self.Counterpoint[i], self.Rules[i]
+                return
+
+        # Lines read from the cache were never generated, so the random number generator has not made their choices.  Before a
+        # line is generated, they are generated again, unseen, so that it is the same as it would have been without the cache.
+        Behind, self.Behind = self.Behind, []
+        for CachedVersion in Behind:
+            self.Clear()
+            for i in self.Positions(CachedVersion):
+                pass
+
+        self.Clear()
+        Positions = self.Positions(Version)
+        if Positions is None:
+            return
+
+        # When instrumentation has been asked for, every position is measured as it is generated
+        if self.Instrumentation is not None:
+            Positions = self.Instrumentation.Measure(self, Version, Positions)
+
+        for i in Positions:
+            yield i, self.Cantus[i], self.Counterpoint[i], self.Rules[i]
+
+        if Key is not None:
+            self.Cache.Put(*Key, self.Cantus, self.Counterpoint, self.Rules)
+
+    def CacheKey(self, Version):
+        """
+        This function returns what the next line of a given version is cached by, or None if it is not cached.  Each line of an
+        exercise is cached by its number as well as its seed, so that a stream of lines can be read back whole.  The beam
+        width is only part of the key for BeamIteration, the one version it changes.
+        """
+
+        # A numeric seed always gives the same lines, so they may already be in the cache (which holds seeds of up to 64 bits)
+        if self.Cache is None or Version not in self.CachedVersions:
+            return None
+        if not isinstance(self.Seed, int) or not -2 ** 63 <= self.Seed < 2 ** 63:
+            return None
+
+        BeamWidth = self.BeamWidth if Version == "BeamIteration" else 0
+        return Version, self.Species, self.Mode, self.Seed, self.Lines, BeamWidth, self.RuleSetVersion
+
+    def Positions(self, Version):
         # Depending on which version the user has selected, a contrapuntal line will be generated
         if Version == "FirstIteration":
-            self.FirstIteration()
+            Positions = self.FirstIteration()
         elif Version == "SecondIteration":
-            self.SecondIteration()
+            Positions = self.SecondIteration()
         elif Version == "ThirdIteration":
-            self.ThirdIteration()
+            Positions = self.ThirdIteration()
         elif Version == "FourthIteration":
-            self.FourthIteration()
+            Positions = self.FourthIteration()
         elif Version == "FifthIteration":
-            self.FifthIteration()
+            Positions = self.FifthIteration()
+        elif Version == "DynamicIteration":
+            Positions = self.DynamicIteration()
+        elif Version == "UniformIteration":
+            Positions = self.UniformIteration()
+        elif Version == "BeamIteration":
+            Positions = self.BeamIteration()
+        elif Version == "OptimalIteration":
+            Positions = self.OptimalIteration()
+        elif Version == "StrictIteration":
+            Positions = self.StrictIteration()
+        else:
+            return None
+
+        return Positions
+
+    def Append(self, Pitch, Rule):
+        # Adds a pitch to the counterpoint, along with the name of the rule that chose it
+        self.Counterpoint.append(Pitch)
+        self.Rules.append(Rule)
+        self.State.Push(Pitch)
 
     def Clear(self):
         # Resets the counterpoint variable for repetitive use
         self.Counterpoint = []
+        self.Rules = []
+        self.State.Clear()
+
+    @classmethod
+    def Batch(cls, Version, Species, Mode, Count, Seed=None, BeamWidth=None):
+        """
+        This function generates many counterpoint exercises for the same version, species, and mode in a single call.  The
+        cantus firmus is looked up once and a single exercise is cleared and reused for every line, so no objects are created
+        per exercise.
+
+        The lines are returned as a two dimensional NumPy array of small integers, with one row per exercise and one column
+        per position in the cantus.  Every row shares the same cantus, which can be found with CantusFirmus.GetCantus.  The
+        whole batch is drawn from a single random number generator made from Seed, so the same seed gives the same batch.
+        BeamWidth is passed on to the exercise, and only changes the lines of BeamIteration.
+        """
+
+        # The first iteration has a vectorized version that advances every line at once
+        if Version == "FirstIteration":
+            from BatchCounterpoint import FirstIterationBatch
+            return FirstIterationBatch(Species, Mode, Count, Seed)
+
+        # NumPy is only needed for batches, so it is imported here rather than at the top of the file
+        import numpy
+
+        EX = cls(Version, Species, Mode, Seed, BeamWidth)
+        Lines = numpy.empty((Count, len(EX.Cantus)), dtype=numpy.int8)
+
+        for n in range(Count):
+            # The first line was generated when the exercise was created
+            if n > 0:
+                EX.Clear()
+                EX.Generate(Version)
+            Lines[n] = EX.Counterpoint
+
+        return Lines
+
+    def Record(self, Version, Species, Mode):
+        # Returns the finished exercise as a compact record
+        return ExerciseRecord(Version, Species, Mode, self.Cantus, self.Counterpoint)
+
+    @classmethod
+    def Records(cls, Version, Species, Mode, Count, Seed=None, BeamWidth=None):
+        """
+        This function generates many exercises for the same version, species, and mode, like Batch, but returns them as a list
+        of compact records.  Every record shares the same copy of the cantus, so each exercise only costs its own counterpoint.
+        """
+
+        EX = cls(Version, Species, Mode, Seed, BeamWidth)
+        Cantus = bytes(EX.Cantus)
+        Records = []
+
+        for n in range(Count):
+            if n > 0:
+                EX.Generate(Version)
+            Records.append(ExerciseRecord(Version, Species, Mode, Cantus, EX.Counterpoint))
+
+        return Records
 
 
     """
@@ -55,9 +306,22 @@ class Exercise():
     done in a single function, it will be much clearer to keep them separate.
     """
     def FuxImperfectConsonanceStrictUpperRules(self, i, NewPitch):
-        print(None)
-            # Checks a given pitch to see if it satisfies the rules given by Fux
-            
+        """
+        Checks a given pitch to see if it satisfies the rules given by Fux, as the next pitch of the counterpoint at position i.
+        The cadence is fixed, as it is in every iteration; everywhere else the question is answered by the rule state, which
+        already knows everything it needs about the line so far, so the check takes the same time however long the line is.
+        """
+
+        if i != len(self.Counterpoint):
+            return False
+
+        if i == len(self.Cantus) - 2:
+            return NewPitch == self.Cantus[i] + 9
+        elif i == len(self.Cantus) - 1:
+            return NewPitch == self.Cantus[i] + 12
+
+        return self.State.Legal(NewPitch)
+
 
     def FirstIteration(self):
         # The variable 'i' will be used to mark the algorithm's current location within the line
@@ -67,26 +331,26 @@ class Exercise():
             # Note that the index of the algorithm's position is zero based
             if i == 0:
                 # Select the first pitch from the list of possible perfect consonant intervals at random
-                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                 # Add the new pitch to the counterpoint melody
-                self.Counterpoint.append(NewPitch)
+                self.Append(NewPitch, "Opening")
             
             # Special care is needed at the cadence
             # Since the index is zero based, the index of the final pitch is the length of the cantus firmus minus one
             elif i == len(self.Cantus) - 2:
-                self.Counterpoint.append(self.Cantus[i] + 9)
+                self.Append(self.Cantus[i] + 9, "Cadence")
             elif i == len(self.Cantus) - 1:
-                self.Counterpoint.append(self.Cantus[i] + 12)
+                self.Append(self.Cantus[i] + 12, "Cadence")
             
             # For the remaining pitches, the algorithm will prioritize imperfect consonances in contrary motion, then perfect
             # consonances in contrary motion, and finally imperfect consonances in parallel motion - note that perfect consonances in 
             # parallel motion cannot be used and oblique motion arises as a byproduct of following this heirarchy.
             else:
                 # Ascertain the direction of motion in the cantus (positive for ascending, negative for descending, zero for static)
-                CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                CantusDirection = self.State.CantusMotion[i]
 
                 # The algorithm will also need to know what the previous interval
-                PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                PreviousInterval = self.State.LastInterval
 
                 # The algorithm will stop searching once a suitable pitch has been found
                 PitchFound = False
@@ -98,27 +362,21 @@ class Exercise():
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
                         
                         if PitchInMode:
                             if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
                 
@@ -129,27 +387,21 @@ class Exercise():
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                         if PitchInMode:
                             if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
@@ -161,32 +413,29 @@ class Exercise():
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                     # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
                         if PitchInMode:
                             if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                 if not PitchFound:
                     print("Failed to find a pitch")
-                    self.Counterpoint.append(0)
+                    self.Append(0, "NotFound")
+
+            # The pitch at this position has been chosen, so it can be handed on before the next one is found
+            yield i
 
         
     def SecondIteration(self):
@@ -197,26 +446,26 @@ class Exercise():
             # Note that the index of the algorithm's position is zero based
             if i == 0:
                 # Select the first pitch from the list of possible perfect consonant intervals at random
-                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                 # Add the new pitch to the counterpoint melody
-                self.Counterpoint.append(NewPitch)
+                self.Append(NewPitch, "Opening")
             
             # Special care is needed at the cadence
             # Since the index is zero based, the index of the final pitch is the length of the cantus firmus minus one
             elif i == len(self.Cantus) - 2:
-                self.Counterpoint.append(self.Cantus[i] + 9)
+                self.Append(self.Cantus[i] + 9, "Cadence")
             elif i == len(self.Cantus) - 1:
-                self.Counterpoint.append(self.Cantus[i] + 12)
+                self.Append(self.Cantus[i] + 12, "Cadence")
             
             # For the remaining pitches, the algorithm will prioritize imperfect consonances in contrary motion, then perfect
             # consonances in contrary motion, and finally imperfect consonances in parallel motion - note that perfect consonances in 
             # parallel motion cannot be used and oblique motion arises as a byproduct of following this heirarchy.
             else:
                 # Ascertain the direction of motion in the cantus (positive for ascending, negative for descending, zero for static)
-                CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                CantusDirection = self.State.CantusMotion[i]
 
                 # The algorithm will also need to know what the previous interval
-                PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                PreviousInterval = self.State.LastInterval
 
                 # The algorithm will stop searching once a suitable pitch has been found
                 PitchFound = False
@@ -226,36 +475,30 @@ class Exercise():
                     TestedIntervals = []
                     while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                         # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                         while IntervalToCheck in TestedIntervals:
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                         TestedIntervals.append(IntervalToCheck)
 
                         PitchToCheck = self.Cantus[i] + IntervalToCheck
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
                         
                         if PitchInMode:
                             if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectContrary")
                                 PitchFound = True
                                 break
                 
@@ -264,36 +507,30 @@ class Exercise():
                     TestedIntervals = []
                     while len(TestedIntervals) < len(self.fundamentals.PerfectConsonantIntervals) and not PitchFound:
                         # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                         while IntervalToCheck in TestedIntervals:
-                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                         TestedIntervals.append(IntervalToCheck)
 
                         PitchToCheck = self.Cantus[i] + IntervalToCheck
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                         if PitchInMode:
                             if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "PerfectContrary")
                                 PitchFound = True
                                 break
 
@@ -303,41 +540,38 @@ class Exercise():
                     TestedIntervals = []
                     while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                         # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                         while IntervalToCheck in TestedIntervals:
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                         TestedIntervals.append(IntervalToCheck)
 
                         PitchToCheck = self.Cantus[i] + IntervalToCheck
                         ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                     # Confirm that the pitch is within the given mode
-                        PitchInMode = False
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck:
-                                if each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                else:
-                                    PitchInMode = False
+                        PitchInMode = self.fundamentals.InMode(PitchToCheck)
                         if PitchInMode:
                             if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                             elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                self.Counterpoint.append(PitchToCheck)
+                                self.Append(PitchToCheck, "ImperfectParallel")
                                 PitchFound = True
                                 break
 
                 if not PitchFound:
                     print("Failed to find a pitch")
-                    self.Counterpoint.append(0)
+                    self.Append(0, "NotFound")
+
+            # The pitch at this position has been chosen, so it can be handed on before the next one is found
+            yield i
 
 
     def ThirdIteration(self):
@@ -348,74 +582,57 @@ class Exercise():
             # Note that the index of the algorithm's position is zero based
             if i == 0:
                 # Select the first pitch from the list of possible perfect consonant intervals at random
-                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                 # Add the new pitch to the counterpoint melody
-                self.Counterpoint.append(NewPitch)
+                self.Append(NewPitch, "Opening")
             
             # Special care is needed at the cadence
             # Since the index is zero based, the index of the final pitch is the length of the cantus firmus minus one
             elif i == len(self.Cantus) - 2:
-                self.Counterpoint.append(self.Cantus[i] + 9)
+                self.Append(self.Cantus[i] + 9, "Cadence")
             elif i == len(self.Cantus) - 1:
-                self.Counterpoint.append(self.Cantus[i] + 12)
+                self.Append(self.Cantus[i] + 12, "Cadence")
             
             # For the remaining pitches, the algorithm will prioritize stepwise motion, first looking at the adjacent pitch in
             # contrary motion, then parallel motion.
             else:
                 # Again, it ascertains the direction of the cantus
-                CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                CantusDirection = self.State.CantusMotion[i]
 
                 # This boolean allows the algorithm to stop once a suitable pitch has been found
                 PitchFound = False
 
                 if CantusDirection <= 0:
                     # If the cantus is descending, it will first check the next ascending pitch in the counterpoint
-                    PitchToCheck = self.Counterpoint[i - 1] + 1
                     # Simply adding one half step to the previous counterpoint pitch may not yeild a pitch within the mode,
-                    # so it will continue to add half steps until the selected pitch is within the mode.
-                    # Confirm that the pitch is within the given mode
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                PitchInMode = True
-                                break
-                        PitchToCheck += 1
+                    # so the next pitch within the mode is read from the table of steps in Fundamentals.  There is no such
+                    # pitch at the top of the staff, in which case the table holds None.
+                    PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
 
                     # Now it checks the interval of the given pitch to confirm if obeys the rules
-                    IntervalToCheck = PitchToCheck - self.Cantus[i]
-                    PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                    if PitchToCheck is not None:
+                        IntervalToCheck = PitchToCheck - self.Cantus[i]
 
-                    if IntervalToCheck in self.fundamentals.PerfectConsonantIntervals or IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
-                        PitchFound = True
+                        if IntervalToCheck in self.fundamentals.PerfectConsonantIntervals or IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepContrary")
+                            PitchFound = True
 
                     # If the first guess was not suitable, it will try parallel motion
                     if not PitchFound:
-                        PitchToCheck = self.Counterpoint[i - 1] - 1
-                        PitchInMode = False
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck -= 1
-
-                        IntervalToCheck = PitchToCheck - self.Cantus[i]
-                        PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                        PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
 
                         # Parallel motion can only be used when moving to imperfect consonances
-                        if IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepParallel")
                             PitchFound = True
 
                     # If no suitable stepwise pitch has been found, the SecondIteration algorithm will be run in order
                     # to find a suitable pitch.
                     # Ascertain the direction of motion in the cantus (positive for ascending, negative for descending, zero for static)
-                    CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                    CantusDirection = self.State.CantusMotion[i]
 
                     # The algorithm will also need to know what the previous interval
-                    PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                    PreviousInterval = self.State.LastInterval
 
                     # # The algorithm will stop searching once a suitable pitch has been found
                     # PitchFound = False
@@ -425,36 +642,30 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                             # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
                             
                             if PitchInMode:
                                 if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
                     
@@ -463,36 +674,30 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.PerfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                             # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                             if PitchInMode:
                                 if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
@@ -502,86 +707,62 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
                             if PitchInMode:
                                 if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
                 
                 # This part of the algorithm is the same as the previous section, only for when the cantus is ascending
-                if CantusDirection >= 0:
-                    # If the cantus is descending, it will first check the next ascending pitch in the counterpoint
-                    PitchToCheck = self.Counterpoint[i - 1] - 1
-                    # Simply adding one half step to the previous counterpoint pitch may not yeild a pitch within the mode,
-                    # so it will continue to add half steps until the selected pitch is within the mode.
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                PitchInMode = True
-                                break
-                        PitchToCheck -= 1
+                # A static cantus has already been handled above, so this only runs if no pitch has been found yet
+                if CantusDirection >= 0 and not PitchFound:
+                    # If the cantus is ascending, it will first check the next descending pitch in the counterpoint
+                    PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
 
                     # Now it checks the interval of the given pitch to confirm if obeys the rules
-                    IntervalToCheck = PitchToCheck - self.Cantus[i]
-                    PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                    if PitchToCheck is not None:
+                        IntervalToCheck = PitchToCheck - self.Cantus[i]
 
-                    if IntervalToCheck in self.fundamentals.PerfectConsonantIntervals or IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
-                        PitchFound = True
+                        if IntervalToCheck in self.fundamentals.PerfectConsonantIntervals or IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepContrary")
+                            PitchFound = True
 
                     # If the first guess was not suitable, it will try parallel motion
                     if not PitchFound:
-                        PitchToCheck = self.Counterpoint[i - 1] + 1
-                        PitchInMode = False
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck += 1
-
-                        IntervalToCheck = PitchToCheck - self.Cantus[i]
-                        PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                        PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
 
                         # Parallel motion can only be used when moving to imperfect consonances
-                        if IntervalToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepParallel")
                             PitchFound = True
 
                     # If no suitable stepwise pitch has been found, the SecondIteration algorithm will be run in order
                     # to find a suitable pitch.
                     # Ascertain the direction of motion in the cantus (positive for ascending, negative for descending, zero for static)
-                    CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                    CantusDirection = self.State.CantusMotion[i]
 
                     # The algorithm will also need to know what the previous interval
-                    PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                    PreviousInterval = self.State.LastInterval
 
                     # # The algorithm will stop searching once a suitable pitch has been found
                     # PitchFound = False
@@ -591,36 +772,30 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                             # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
                             
                             if PitchInMode:
                                 if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectContrary")
                                     PitchFound = True
                                     break
                     
@@ -629,36 +804,30 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.PerfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                             # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                             if PitchInMode:
                                 if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "PerfectContrary")
                                     PitchFound = True
                                     break
 
@@ -668,41 +837,38 @@ class Exercise():
                         TestedIntervals = []
                         while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                             # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                            IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             while IntervalToCheck in TestedIntervals:
-                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                             TestedIntervals.append(IntervalToCheck)
 
                             PitchToCheck = self.Cantus[i] + IntervalToCheck
                             ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                         # Confirm that the pitch is within the given mode
-                            PitchInMode = False
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck:
-                                    if each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                    else:
-                                        PitchInMode = False
+                            PitchInMode = self.fundamentals.InMode(PitchToCheck)
                             if PitchInMode:
                                 if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
 
                                 elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                    self.Counterpoint.append(PitchToCheck)
+                                    self.Append(PitchToCheck, "ImperfectParallel")
                                     PitchFound = True
                                     break
 
                 if not PitchFound:
                     print("Failed to find a pitch")
-                    self.Counterpoint.append(0)
+                    self.Append(0, "NotFound")
+
+            # The pitch at this position has been chosen, so it can be handed on before the next one is found
+            yield i
 
     
     def FourthIteration(self):
@@ -714,57 +880,42 @@ class Exercise():
             # Note that the index of the algorithm's position is zero based
             if i == 0:
                 # Select the first pitch from the list of possible perfect consonant intervals at random
-                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                 # Add the new pitch to the counterpoint melody
-                self.Counterpoint.append(NewPitch)
+                self.Append(NewPitch, "Opening")
             
             # Special care is needed at the cadence
             # Since the index is zero based, the index of the final pitch is the length of the cantus firmus minus one
             elif i == len(self.Cantus) - 2:
-                self.Counterpoint.append(self.Cantus[i] + 9)
+                self.Append(self.Cantus[i] + 9, "Cadence")
             elif i == len(self.Cantus) - 1:
-                self.Counterpoint.append(self.Cantus[i] + 12)
+                self.Append(self.Cantus[i] + 12, "Cadence")
             
             # For the remaining pitches, the algorithm will prioritize stepwise motion, first looking at the adjacent pitch in
             # contrary motion, then parallel motion.
             else:
-                CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
-                PreviousInterval = self.Counterpoint[i - 1] - self.Cantus[i - 1]
+                CantusDirection = self.State.CantusMotion[i]
+                PreviousInterval = self.State.LastInterval
                 PitchFound = False
 
                 if CantusDirection >= 0:
-                    PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                PitchInMode = True
-                                break
-                        PitchToCheck += 1
+                    PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
 
                     # The algorithm will check if the pitch is a perfect consonance, imperfect consonance, or dissonance
-                    if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
+                    if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                        self.Append(PitchToCheck, "StepImperfect")
                         PitchFound = True
                     else:
                         # Save the first guess.  If neither contrary nor similar motion yeild an imperfect consonance the
                         # algorithm will use the first pitch if it is a perfect consonance.
                         FirstPitch = PitchToCheck
-                        PitchToCheck = self.Counterpoint[i - 1] - 1
-
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck -= 1
+                        PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
 
-                        if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepImperfect")
                             PitchFound = True
-                        elif FirstPitch - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                            self.Counterpoint.append(FirstPitch)
+                        elif FirstPitch is not None and FirstPitch - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
+                            self.Append(FirstPitch, "StepPerfect")
                             PitchFound = True
                         else:
                             # Since neither direction yeilded a suitable pitch, the algorithm will resort to finding
@@ -773,36 +924,30 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                     # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
                                     
                                     if PitchInMode:
                                         if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
                             
@@ -811,36 +956,30 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.PerfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                     # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                                     if PitchInMode:
                                         if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
@@ -850,76 +989,55 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                 # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
                                     if PitchInMode:
                                         if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                     if not PitchFound:
                         print("Failed to find a pitch")
-                        self.Counterpoint.append(0)
+                        self.Append(0, "NotFound")
 
                 # Same as before, now for descending lines
                 else:
-                    PitchToCheck = self.Counterpoint[i - 1] - 1
-
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                PitchInMode = True
-                                break
-                        PitchToCheck -= 1
+                    PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
 
                     # The algorithm will check if the pitch is a perfect consonance, imperfect consonance, or dissonance
-                    if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
+                    if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                        self.Append(PitchToCheck, "StepImperfect")
                         PitchFound = True
                     else:
                         # Save the first guess.  If neither contrary nor similar motion yeild an imperfect consonance the
                         # algorithm will use the first pitch if it is a perfect consonance.
                         FirstPitch = PitchToCheck
-                        PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck += 1
+                        PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
 
-                        if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                            self.Append(PitchToCheck, "StepImperfect")
                             PitchFound = True
-                        elif FirstPitch - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                            self.Counterpoint.append(FirstPitch)
+                        elif FirstPitch is not None and FirstPitch - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
+                            self.Append(FirstPitch, "StepPerfect")
                             PitchFound = True
                         else:
                             # Since neither direction yeilded a suitable pitch, the algorithm will resort to finding
@@ -928,36 +1046,30 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                     # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
                                     
                                     if PitchInMode:
                                         if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectContrary")
                                             PitchFound = True
                                             break
                             
@@ -966,36 +1078,30 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.PerfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                     # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
 
                                     if PitchInMode:
                                         if CantusDirection < 0 and (ResultingCounterpointDirection > 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection == 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and (ResultingCounterpointDirection < 0 or ResultingCounterpointDirection > 0):
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "PerfectContrary")
                                             PitchFound = True
                                             break
 
@@ -1005,251 +1111,766 @@ class Exercise():
                                 TestedIntervals = []
                                 while len(TestedIntervals) < len(self.fundamentals.ImperfectConsonantIntervals) and not PitchFound:
                                     # Now that randomness has been added, the algorithm will need to keep a running list of each tested interval to prevent itself from testing the same one multiple times
-                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                    IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     while IntervalToCheck in TestedIntervals:
-                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
+                                        IntervalToCheck = self.fundamentals.ImperfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.ImperfectConsonantIntervals) - 1)]
                                     TestedIntervals.append(IntervalToCheck)
 
                                     PitchToCheck = self.Cantus[i] + IntervalToCheck
                                     ResultingCounterpointDirection = PitchToCheck - self.Counterpoint[i - 1]
 
                                 # Confirm that the pitch is within the given mode
-                                    PitchInMode = False
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck:
-                                            if each[:-1] in self.fundamentals.Mode:
-                                                PitchInMode = True
-                                            else:
-                                                PitchInMode = False
+                                    PitchInMode = self.fundamentals.InMode(PitchToCheck)
                                     if PitchInMode:
                                         if CantusDirection < 0 and ResultingCounterpointDirection < 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection > 0 and ResultingCounterpointDirection > 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                                         elif CantusDirection == 0 and ResultingCounterpointDirection == 0:
-                                            self.Counterpoint.append(PitchToCheck)
+                                            self.Append(PitchToCheck, "ImperfectParallel")
                                             PitchFound = True
                                             break
 
                         if not PitchFound:
                             print("Failed to find a pitch")
-                            self.Counterpoint.append(0)
+                            self.Append(0, "NotFound")
+
+            # The pitch at this position has been chosen, so it can be handed on before the next one is found
+            yield i
                 
 
     def FifthIteration(self):
         for i in range(len(self.Cantus)):
             if i == 0:
-                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
-                self.Counterpoint.append(NewPitch)
+                NewPitch = self.Cantus[i] + self.fundamentals.PerfectConsonantIntervals[self.Random.randint(0, len(self.fundamentals.PerfectConsonantIntervals) - 1)]
+                self.Append(NewPitch, "Opening")
             elif i == len(self.Cantus) - 2:
-                self.Counterpoint.append(self.Cantus[i] + 9)
+                self.Append(self.Cantus[i] + 9, "Cadence")
             elif i == len(self.Cantus) - 1:
-                self.Counterpoint.append(self.Cantus[i] + 12)
+                self.Append(self.Cantus[i] + 12, "Cadence")
             else:
-                CantusDirection = self.Cantus[i] - self.Cantus[i - 1]
+                CantusDirection = self.State.CantusMotion[i]
+                PitchFound = False
 
                 # First try stepwise motion (with stepwise defined as less than a major third)
+                # The steps are read from the tables in Fundamentals, which hold None past the edges of the staff
                 if CantusDirection >= 0:
-                    PitchToCheck = self.Counterpoint[i - 1] + 1
+                    PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
 
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                PitchInMode = True
-                                break
-                        PitchToCheck += 1
-
-                    if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
+                    if PitchToCheck is not None and (PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals):
+                        self.Append(PitchToCheck, "Step")
                         PitchFound = True
                     else:
-                        # Add 1 again to see if a third works
-                        PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                        PitchInMode = False
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck += 1
+                        # Step up again to see if a third works
+                        PitchToCheck = self.fundamentals.StepUp(PitchToCheck)
                         
-                        if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and (PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals):
+                            self.Append(PitchToCheck, "StepThird")
                             PitchFound = True
                         else:
                             # Try parallel motion in stepwise motion
-                            PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                            PitchInMode = False
-                            while PitchInMode == False:
-                                for each in self.fundamentals.Pitches:
-                                    if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                        break
-                                PitchToCheck -= 1
-
-                            if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                                self.Counterpoint.append(PitchToCheck)
+                            PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
+
+                            if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                                self.Append(PitchToCheck, "ParallelStep")
                                 PitchFound = True
                             else:
-                                # Subtract 1 again to see if a third works
-                                PitchToCheck = self.Counterpoint[i - 1] - 1
-
-                                PitchInMode = False
-                                while PitchInMode == False:
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                            PitchInMode = True
-                                            break
-                                    PitchToCheck -= 1
+                                # Step down again to see if a third works
+                                PitchToCheck = self.fundamentals.StepDown(PitchToCheck)
                                 
-                                if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                                    self.Counterpoint.append(PitchToCheck)
+                                if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                                    self.Append(PitchToCheck, "ParallelThird")
                                     PitchFound = True
                                 else:
                                     # If no suitable pitch has been found, the algorithm will cycle through all possible imperfect consonances
                                     for n in self.fundamentals.ImperfectConsonantIntervals:
                                         PitchToCheck = self.Cantus[i] + n
-                                        if not PitchFound:
-                                            for each in self.fundamentals.Pitches:
-                                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                                    PitchFound = True
-                                                    self.Counterpoint.append(self.Cantus[i] + n)
-                                                    break
+                                        if self.fundamentals.InMode(PitchToCheck):
+                                            PitchFound = True
+                                            self.Append(PitchToCheck, "Imperfect")
+                                            break
                                         
                                     if not PitchFound:
                                         for n in self.fundamentals.PerfectConsonantIntervals:
-                                            if not PitchFound:
-                                                PitchToCheck = self.Cantus[i] + n
-                                                for each in self.fundamentals.Pitches:
-                                                    if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode and self.Counterpoint[i - 1] - PitchToCheck < 0:
-                                                        PitchFound = True
-                                                        self.Counterpoint.append(self.Cantus[i] + n)
-                                                        break
+                                            PitchToCheck = self.Cantus[i] + n
+                                            if self.fundamentals.InMode(PitchToCheck) and self.Counterpoint[i - 1] - PitchToCheck < 0:
+                                                PitchFound = True
+                                                self.Append(PitchToCheck, "Perfect")
+                                                break
                                             
-                                            if not PitchFound:
-                                                self.Counterpoint.append(0)
-                                                print("No suitable pitch found")
+                                    if not PitchFound:
+                                        self.Append(0, "NotFound")
+                                        print("No suitable pitch found")
                 
                 elif CantusDirection < 0:
-                    PitchToCheck = self.Counterpoint[i - 1] - 1
-
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode and (PitchToCheck in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck in self.fundamentals.PerfectConsonantIntervals):
-                                PitchInMode = True
-                                break
-                        PitchToCheck -= 1
+                    PitchToCheck = self.fundamentals.StepDown(self.Counterpoint[i - 1])
 
-                    if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                        self.Counterpoint.append(PitchToCheck)
+                    if PitchToCheck is not None and (PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals):
+                        self.Append(PitchToCheck, "Step")
                         PitchFound = True
                     else:
-                        # Add 1 again to see if a third works
-                        PitchToCheck = self.Counterpoint[i - 1] - 1
-
-                        PitchInMode = False
-                        while PitchInMode == False:
-                            for each in self.fundamentals.Pitches:
-                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                    PitchInMode = True
-                                    break
-                            PitchToCheck -= 1
+                        # Step down again to see if a third works
+                        PitchToCheck = self.fundamentals.StepDown(PitchToCheck)
                         
-                        if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals:
-                            self.Counterpoint.append(PitchToCheck)
+                        if PitchToCheck is not None and (PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals or PitchToCheck - self.Cantus[i] in self.fundamentals.PerfectConsonantIntervals):
+                            self.Append(PitchToCheck, "StepThird")
                             PitchFound = True
                         else:
                             # Try parallel motion in stepwise motion
-                            PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                            PitchInMode = False
-                            while PitchInMode == False:
-                                for each in self.fundamentals.Pitches:
-                                    if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                        PitchInMode = True
-                                        break
-                                PitchToCheck += 1
-
-                            if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                                self.Counterpoint.append(PitchToCheck)
+                            PitchToCheck = self.fundamentals.StepUp(self.Counterpoint[i - 1])
+
+                            if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                                self.Append(PitchToCheck, "ParallelStep")
                                 PitchFound = True
                             else:
-                                # Subtract 1 again to see if a third works
-                                PitchToCheck = self.Counterpoint[i - 1] + 1
-
-                                PitchInMode = False
-                                while PitchInMode == False:
-                                    for each in self.fundamentals.Pitches:
-                                        if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                            PitchInMode = True
-                                            break
-                                    PitchToCheck += 1
+                                # Step up again to see if a third works
+                                PitchToCheck = self.fundamentals.StepUp(PitchToCheck)
                                 
-                                if PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
-                                    self.Counterpoint.append(PitchToCheck)
+                                if PitchToCheck is not None and PitchToCheck - self.Cantus[i] in self.fundamentals.ImperfectConsonantIntervals:
+                                    self.Append(PitchToCheck, "ParallelThird")
                                     PitchFound = True
                                 else:
                                     # If no suitable pitch has been found, the algorithm will cycle through all possible imperfect consonances
                                     for n in self.fundamentals.ImperfectConsonantIntervals:
                                         PitchToCheck = self.Cantus[i] + n
-                                        for each in self.fundamentals.Pitches:
-                                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode:
-                                                PitchFound = True
-                                                self.Counterpoint.append(self.Cantus[i] + n)
+                                        if self.fundamentals.InMode(PitchToCheck):
+                                            PitchFound = True
+                                            self.Append(PitchToCheck, "Imperfect")
+                                            break
                                         
                                     if not PitchFound:
                                         for n in self.fundamentals.PerfectConsonantIntervals:
                                             PitchToCheck = self.Cantus[i] + n
-                                            for each in self.fundamentals.Pitches:
-                                                if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode and self.Counterpoint[i - 1] - PitchToCheck >= 0:
-                                                    PitchFound = True
-                                                    self.Counterpoint.append(self.Cantus[i] + n)
+                                            if self.fundamentals.InMode(PitchToCheck) and self.Counterpoint[i - 1] - PitchToCheck >= 0:
+                                                PitchFound = True
+                                                self.Append(PitchToCheck, "Perfect")
+                                                break
                                             
-                                            if not PitchFound:
-                                                self.Counterpoint.append(0)
-                                                print("No suitable pitch found")
+                                    if not PitchFound:
+                                        self.Append(0, "NotFound")
+                                        print("No suitable pitch found")
+
+            # The pitch at this position has been chosen, so it can be handed on before the next one is found
+            yield i
                                         
 
 
 
 
+    def StrictIteration(self):
+        """
+        This version runs no ladder of its own.  Every candidate is put to FuxImperfectConsonanceStrictUpperRules, which asks
+        the rule state whether it may come next, so adding a rule to RuleState.Legal changes this version without making it
+        any slower per pitch.  Of the consonances above the cantus that are allowed, a pitch that leaves some legal pitch to
+        follow it is chosen before one that does not, then the one nearest the last pitch, then an imperfect consonance before
+        a perfect one, and any that are still tied are chosen between at random.
+        """
+
+        Intervals = self.fundamentals.ImperfectConsonantIntervals + self.fundamentals.PerfectConsonantIntervals
+        for i in range(len(self.Cantus)):
+            if i == len(self.Cantus) - 2:
+                self.Append(self.Cantus[i] + 9, "Cadence")
+            elif i == len(self.Cantus) - 1:
+                self.Append(self.Cantus[i] + 12, "Cadence")
+            else:
+                Best = None
+                for Interval in Intervals:
+                    NewPitch = self.Cantus[i] + Interval
+                    if not self.FuxImperfectConsonanceStrictUpperRules(i, NewPitch):
+                        continue
+
+                    # The pitch is tried, to see whether anything could follow it, and then taken back (the cadence is fixed,
+                    # so the pitch before it needs nothing to follow)
+                    DeadEnd = False
+                    if i + 1 < len(self.Cantus) - 2:
+                        Saved = self.State.Save()
+                        self.State.Push(NewPitch)
+                        DeadEnd = not any(self.State.Legal(self.Cantus[i + 1] + Next) for Next in Intervals)
+                        self.State.Restore(Saved)
+
+                    # The opening has no last pitch to be near
+                    Distance = 0 if i == 0 else abs(NewPitch - self.State.LastPitch)
+                    Rank = (DeadEnd, Distance, Interval in self.fundamentals.PerfectConsonantIntervals, self.Random.random())
+                    if Best is None or Rank < Best[0]:
+                        Best = (Rank, NewPitch)
+
+                if Best is None:
+                    print("Failed to find a pitch")
+                    self.Append(0, "NotFound")
+                elif i == 0:
+                    self.Append(Best[1], "Opening")
+                elif Best[0][2]:
+                    self.Append(Best[1], "Perfect")
+                else:
+                    self.Append(Best[1], "Imperfect")
+
+            yield i
+
+    def DynamicIterationRules(self, i, PreviousPitch, NewPitch):
+        """
+        Checks whether a given pitch may follow the previous counterpoint pitch at position i.  These are the rules that
+        FirstIteration follows, written as a single yes or no answer so that every possible line can be searched: the line
+        opens on a perfect consonance and closes on the usual cadence, and in between only consonances within the mode are
+        used, perfect consonances are reached by contrary or oblique motion, and imperfect consonances may only be reached in
+        parallel motion from an imperfect consonance.
+
+        If PreviousPitch is None, only the pitch itself is checked and the motion into it is ignored.
+        """
+
+        # The cadence is fixed, so it is the only pitch allowed at the last two positions
+        if i == len(self.Cantus) - 2:
+            if NewPitch != self.Cantus[i] + 9:
+                return False
+        elif i == len(self.Cantus) - 1:
+            if NewPitch != self.Cantus[i] + 12:
+                return False
+        elif not self.fundamentals.InMode(NewPitch):
+            return False
+
+        Interval = NewPitch - self.Cantus[i]
+
+        # The first interval must be a perfect consonance
+        if i == 0:
+            return Interval in self.fundamentals.PerfectConsonantIntervals
+
+        if Interval not in self.fundamentals.PerfectConsonantIntervals and Interval not in self.fundamentals.ImperfectConsonantIntervals:
+            return False
+
+        if PreviousPitch is None:
+            return True
+
+        return self.MotionRules(self.Cantus[i - 1], self.Cantus[i], PreviousPitch, NewPitch)
+
+    @classmethod
+    def MotionRules(cls, PreviousCantus, Cantus, PreviousPitch, NewPitch):
+        """
+        Checks the motion from PreviousPitch over PreviousCantus to NewPitch over Cantus, which is the part of the rules in
+        DynamicIterationRules that depends on the previous pitch.  NewPitch must form a consonance with the cantus.  Since the
+        answer only depends on these four pitches, it is the same for every exercise, and is kept in the table of legal moves.
+        """
+
+        Interval = NewPitch - Cantus
+        if Interval not in cls.fundamentals.PerfectConsonantIntervals and Interval not in cls.fundamentals.ImperfectConsonantIntervals:
+            return False
+
+        CantusDirection = Cantus - PreviousCantus
+        ResultingCounterpointDirection = NewPitch - PreviousPitch
+        PreviousInterval = PreviousPitch - PreviousCantus
+
+        # Parallel motion means both voices move the same way, or both stay where they are
+        ParallelMotion = (CantusDirection < 0 and ResultingCounterpointDirection < 0) or (CantusDirection > 0 and ResultingCounterpointDirection > 0) or (CantusDirection == 0 and ResultingCounterpointDirection == 0)
+
+        if Interval in cls.fundamentals.PerfectConsonantIntervals:
+            return not ParallelMotion
+        else:
+            return not ParallelMotion or PreviousInterval not in cls.fundamentals.PerfectConsonantIntervals
+
+    @classmethod
+    def BuildTransitions(cls, Mode):
+        """
+        This function works out every legal move against the cantus of a given mode.  The moves are kept for every pair of
+        neighbouring cantus pitches, including a pitch followed by itself as it is in the later species, so the same table
+        serves every species.  For each pair there is a list indexed by the previous counterpoint pitch, holding a number with
+        one bit set for every pitch that may follow it (bit 0 for C2, as in Fundamentals.ModeMask).
+        """
+
+        Cantus = CantusFirmus.Modes[Mode]
+        Pairs = set((Cantus[i - 1], Cantus[i]) for i in range(1, len(Cantus))) | set((Pitch, Pitch) for Pitch in Cantus)
+        Staff = range(len(cls.fundamentals.PitchNames))
+
+        Moves = {}
+        for PreviousCantus, CantusPitch in sorted(Pairs):
+            Moves[PreviousCantus, CantusPitch] = [sum(1 << NewPitch for NewPitch in Staff if cls.MotionRules(PreviousCantus, CantusPitch, PreviousPitch, NewPitch)) for PreviousPitch in Staff]
+        return Moves
+
+    @classmethod
+    def LoadTransitions(cls):
+        """
+        This function loads the legal moves for every mode from the file at TransitionPath.  If there is no such file, or it was
+        made for other rules or other cantus firmi, the moves are worked out again and the file is rewritten, so only the first
+        run pays for them.  If the file cannot be written, or TransitionPath is None, the moves are still kept for as long as the
+        program runs.
+        """
+
+        Transitions = {}
+        if cls.TransitionPath is not None:
+            try:
+                with open(cls.TransitionPath) as File:
+                    Saved = json.load(File)
+                if Saved["RuleSetVersion"] == cls.RuleSetVersion:
+                    for Mode in CantusFirmus.Modes:
+                        if Saved["Modes"][Mode]["Cantus"] == CantusFirmus.Modes[Mode]:
+                            Transitions[Mode] = {tuple(int(Pitch) for Pitch in Pair.split(",")): Moves for Pair, Moves in Saved["Modes"][Mode]["Moves"].items()}
+            except (OSError, ValueError, KeyError):
+                pass
+
+        if len(Transitions) < len(CantusFirmus.Modes):
+            for Mode in CantusFirmus.Modes:
+                if Mode not in Transitions:
+                    Transitions[Mode] = cls.BuildTransitions(Mode)
+
+            if cls.TransitionPath is None:
+                cls.Transitions = Transitions
+                return
+
+            Saved = {"RuleSetVersion": cls.RuleSetVersion, "Modes": {}}
+            for Mode in CantusFirmus.Modes:
+                Saved["Modes"][Mode] = {
+                    "Cantus": CantusFirmus.Modes[Mode],
+                    "Moves": {"%d,%d" % Pair: Moves for Pair, Moves in Transitions[Mode].items()}
+                }
+
+            # The file is written under another name and then moved into place, so that a process reading it never sees it
+            # half written
+            try:
+                with open(cls.TransitionPath + ".%d" % os.getpid(), "w") as File:
+                    json.dump(Saved, File)
+                os.replace(cls.TransitionPath + ".%d" % os.getpid(), cls.TransitionPath)
+            except OSError:
+                pass
+
+        cls.Transitions = Transitions
+
+    def Moves(self, i, PreviousPitch):
+        # Returns the pitches that may follow PreviousPitch at position i, as a number with one bit set for each pitch
+        if not self.Transitions:
+            self.LoadTransitions()
+        return self.Transitions[self.Mode][self.Cantus[i - 1], self.Cantus[i]][PreviousPitch]
+
+    def AllowedPitches(self, i):
+        # Returns every pitch that may be used at position i, before the motion into it is considered
+        return [Pitch for Pitch in range(len(self.fundamentals.PitchNames)) if self.DynamicIterationRules(i, None, Pitch)]
+
+    # The pitches from which a valid line can be completed are the same for every exercise against the same cantus, so they
+    # are remembered here, keyed by the cantus
+    ViablePitches = {}
+
+    def FindViablePitches(self):
+        """
+        This function works backwards from the end of the cantus to find, for every position, the pitches from which the rest
+        of the line can be completed without breaking any rules.  Each position only needs the answers for the position after
+        it, so the whole search takes a single pass over the positions.  The moves that may follow each pitch are read from the
+        table of legal moves, so each pitch is checked against every viable pitch after it at once.
+        """
+
+        Key = tuple(self.Cantus)
+        if Key not in self.ViablePitches:
+            Viable = [[] for each in self.Cantus]
+            NextMask = 0
+
+            for i in range(len(self.Cantus) - 1, -1, -1):
+                for NewPitch in self.AllowedPitches(i):
+                    # The final pitch has nothing to follow it; any other pitch needs at least one viable pitch after it
+                    if i == len(self.Cantus) - 1 or self.Moves(i + 1, NewPitch) & NextMask:
+                        Viable[i].append(NewPitch)
+
+                # The pitches that are viable here, with one bit set for each, for checking the position before this one
+                NextMask = sum(1 << each for each in Viable[i])
+
+            self.ViablePitches[Key] = Viable
+
+        return self.ViablePitches[Key]
+
+    def DynamicIteration(self):
+        """
+        Unlike the previous iterations, this one never paints itself into a corner.  Since it knows which pitches can still
+        lead to a complete line, it only ever chooses among those, so a valid line is found on the first attempt or, if the
+        rules allow no line at all against this cantus, that is known before any pitch is chosen.
+        """
+
+        Viable = self.FindViablePitches()
+
+        if len(Viable[0]) == 0:
+            print("No valid counterpoint exists")
+            for i in range(len(self.Cantus)):
+                self.Append(0, "NotFound")
+                yield i
+            return
+
+        for i in range(len(self.Cantus)):
+            # Every viable pitch that may follow the previous one is equally likely to be chosen
+            if i == 0:
+                Choices = Viable[i]
+            else:
+                Moves = self.Moves(i, self.Counterpoint[i - 1])
+                Choices = [each for each in Viable[i] if Moves >> each & 1]
+            self.Append(Choices[self.Random.randint(0, len(Choices) - 1)], "Viable")
+            yield i
+
+    # The number of ways to complete a line from each pitch is also the same for every exercise against the same cantus
+    CompletionCounts = {}
+
+    def CountCompletions(self, Weights=None):
+        """
+        This function counts, for every position and every pitch, the number of valid lines that continue from that pitch to
+        the end of the cantus.  Like FindViablePitches, it works backwards over the cantus in a single pass: the count for a
+        pitch is the sum of the counts of every pitch that may follow it.
+
+        Weights can be given as a dictionary of interval classes, such as {'P': 1, 'I': 2}, in which case every line is counted
+        as the product of the weights of its intervals rather than as one.
+        """
+
+        Key = (tuple(self.Cantus), tuple(sorted(Weights.items())) if Weights else None)
+        if Key not in self.CompletionCounts:
+            Counts = [{} for each in self.Cantus]
+
+            for i in range(len(self.Cantus) - 1, -1, -1):
+                for NewPitch in self.AllowedPitches(i):
+                    if i == len(self.Cantus) - 1:
+                        Count = 1
+                    else:
+                        Count = 0
+                        Moves = self.Moves(i + 1, NewPitch)
+                        for NextPitch in Counts[i + 1]:
+                            if Moves >> NextPitch & 1:
+                                Count += Counts[i + 1][NextPitch]
+
+                    if Weights:
+                        Count *= Weights.get(self.fundamentals.IntervalClasses[NewPitch][self.Cantus[i]], 0)
+
+                    if Count:
+                        Counts[i][NewPitch] = Count
+
+            self.CompletionCounts[Key] = Counts
+
+        return self.CompletionCounts[Key]
+
+    def CountSolutions(self, Weights=None):
+        # Returns the number of valid lines against this cantus (or their total weight)
+        return sum(self.CountCompletions(Weights)[0].values())
+
+    def UniformIteration(self, Weights=None):
+        """
+        This iteration chooses a line at random from every valid line against the cantus, with every line equally likely.  The
+        counts found by CountCompletions say how many lines lie behind each choice, so each pitch is chosen with a probability
+        in proportion to its count.  There is no need to draw again after a bad choice, since there are none, and every line
+        costs a single pass over the cantus.  If Weights are given, lines are chosen in proportion to their weight instead.
+        """
+
+        Counts = self.CountCompletions(Weights)
+
+        if len(Counts[0]) == 0:
+            print("No valid counterpoint exists")
+            for i in range(len(self.Cantus)):
+                self.Append(0, "NotFound")
+                yield i
+            return
+
+        for i in range(len(self.Cantus)):
+            if i == 0:
+                Choices = list(Counts[i])
+            else:
+                Moves = self.Moves(i, self.Counterpoint[i - 1])
+                Choices = [each for each in Counts[i] if Moves >> each & 1]
+
+            # Draw a number up to the total count of the choices and find the choice it falls within
+            Total = sum(Counts[i][each] for each in Choices)
+            if isinstance(Total, int):
+                Draw = self.Random.randint(1, Total)
+            else:
+                Draw = self.Random.random() * Total
+
+            for each in Choices:
+                Draw -= Counts[i][each]
+                if Draw <= 0:
+                    break
+            self.Append(each, "Uniform")
+            yield i
+
+    def TransitionCost(self, i, PreviousPitch, NewPitch):
+        """
+        Returns the cost of moving from PreviousPitch to NewPitch at position i, using the costs defined above.  Perfect
+        consonances cost more than imperfect ones, except at the opening and the final pitch where they are required; thirds
+        cost more than steps, and leaps more again; and oblique and similar motion cost more than contrary motion.  The cost
+        only depends on the two pitches and the cantus, so the cost of a line is the sum of the costs of its moves.
+
+        If PreviousPitch is None, only the pitch itself is costed.
+        """
+
+        Cost = 0
+        if 0 < i < len(self.Cantus) - 1 and self.fundamentals.IntervalClasses[NewPitch][self.Cantus[i]] == 'P':
+            Cost += self.Costs["Perfect"]
+
+        if PreviousPitch is None:
+            return Cost
+
+        Melodic = abs(NewPitch - PreviousPitch)
+        if Melodic == 0:
+            Cost += self.Costs["Repeat"]
+        elif Melodic > 4:
+            Cost += self.Costs["Leap"] + self.Costs["LeapPerHalfStep"] * (Melodic - 5)
+        elif Melodic > 2:
+            Cost += self.Costs["Third"]
+
+        CantusDirection = self.State.CantusMotion[i]
+        ResultingCounterpointDirection = (NewPitch > PreviousPitch) - (NewPitch < PreviousPitch)
+        if CantusDirection != ResultingCounterpointDirection and (CantusDirection == 0 or ResultingCounterpointDirection == 0):
+            Cost += self.Costs["Oblique"]
+        elif CantusDirection == ResultingCounterpointDirection != 0:
+            Cost += self.Costs["Similar"]
+
+        return Cost
+
+    def BeamIteration(self, Width=None):
+        """
+        Rather than committing to one pitch at a time, this iteration keeps the Width cheapest partial lines (BeamWidth unless
+        a width is given) and extends every one of them by every pitch that may follow it, keeping the cheapest again at each
+        position.  A width of one is as greedy as the earlier iterations, and the wider the beam, the closer the line comes to
+        the cheapest possible one, at the cost of time.  Lines of the same cost are ranked at random, so different seeds still
+        give different exercises.
+
+        Only pitches from which the line can be completed are considered, so every line in the beam reaches the end.  Since the
+        best line is only known once the whole cantus has been searched, the pitches are yielded after the search.
+        """
+
+        Viable = self.FindViablePitches()
+
+        if len(Viable[0]) == 0:
+            print("No valid counterpoint exists")
+            for i in range(len(self.Cantus)):
+                self.Append(0, "NotFound")
+                yield i
+            return
+
+        if Width is None:
+            Width = self.BeamWidth
+        if Width < 1:
+            raise ValueError("the beam width must be at least 1, not " + str(Width))
+
+        # Each partial line is kept along with its cost
+        Beam = [(0, ())]
+        for i in range(len(self.Cantus)):
+            Candidates = []
+            for Cost, Line in Beam:
+                PreviousPitch = Line[-1] if Line else None
+                # Any viable pitch may open the line, so every bit is set for the first position
+                Moves = self.Moves(i, PreviousPitch) if Line else -1
+                for each in Viable[i]:
+                    if Moves >> each & 1:
+                        Candidates.append((Cost + self.TransitionCost(i, PreviousPitch, each), self.Random.random(), Line + (each,)))
+
+            Candidates.sort()
+            Beam = [(Cost, Line) for Cost, Tiebreak, Line in Candidates[:Width]]
+
+        for i, Pitch in enumerate(Beam[0][1]):
+            self.Append(Pitch, "Beam")
+            yield i
+
+    def OptimalIteration(self):
+        """
+        This iteration finds the cheapest line of all, by the same costs as BeamIteration.  Every pitch at every position is
+        treated as a point on a map, with a road from each pitch to every pitch that may follow it, costing as much as the move
+        does.  The cheapest line is then the shortest route from the first position to the last, which is found with the A*
+        search: the partial line that looks cheapest is always extended first, and the search stops as soon as a line reaches
+        the last position.
+
+        A partial line is judged by its cost so far plus an estimate of the cost of the rest.  The estimate adds up, for every
+        remaining position, the cheapest any pitch there could possibly cost, so it is never more than the true cost and the
+        first line to reach the end is always a cheapest one.  Lines of the same cost are ranked at random, so different seeds
+        may give different lines of the same cost.
+        """
+
+        Viable = self.FindViablePitches()
+
+        if len(Viable[0]) == 0:
+            print("No valid counterpoint exists")
+            for i in range(len(self.Cantus)):
+                self.Append(0, "NotFound")
+                yield i
+            return
+
+        Last = len(self.Cantus) - 1
+
+        # The least that the rest of the line can cost after each position
+        Remaining = [0] * len(self.Cantus)
+        for i in range(Last - 1, -1, -1):
+            Remaining[i] = Remaining[i + 1] + min(self.TransitionCost(i + 1, None, each) for each in Viable[i + 1])
+
+        # The cheapest known cost of reaching each pitch at each position, and the pitch before it on that route
+        Cost = {}
+        Previous = {}
+        Queue = []
+        for each in Viable[0]:
+            Cost[0, each] = self.TransitionCost(0, None, each)
+            Previous[0, each] = None
+            Queue.append((Cost[0, each] + Remaining[0], self.Random.random(), 0, each))
+        heapify(Queue)
+
+        Explored = set()
+        while Queue:
+            Estimate, Tiebreak, i, Pitch = heappop(Queue)
+            if (i, Pitch) in Explored:
+                continue
+            Explored.add((i, Pitch))
+
+            if i == Last:
+                break
+
+            Moves = self.Moves(i + 1, Pitch)
+            for each in Viable[i + 1]:
+                if Moves >> each & 1:
+                    NewCost = Cost[i, Pitch] + self.TransitionCost(i + 1, Pitch, each)
+                    if NewCost < Cost.get((i + 1, each), NewCost + 1):
+                        Cost[i + 1, each] = NewCost
+                        Previous[i + 1, each] = Pitch
+                        heappush(Queue, (NewCost + Remaining[i + 1], self.Random.random(), i + 1, each))
+
+        # Follow the route back from the last position to recover the line
+        Line = [Pitch]
+        for i in range(Last, 0, -1):
+            Line.append(Previous[i, Line[-1]])
+        Line.reverse()
+
+        for i, Pitch in enumerate(Line):
+            self.Append(Pitch, "Optimal")
+            yield i
+
     def Smoothing(self):
+        # Large leaps (greater than a fifth) are smoothed out by moving the pitch in the middle of the leap towards the
+        # median of its neighbours, and then stepping through the mode until it forms an imperfect consonance with the cantus.
         for i in range(len(self.Counterpoint) - 3):
             if abs(self.Counterpoint[i] - self.Counterpoint[i + 1]) > 7:
-                median = round(sum(self.Counterpoint[i] + self.Counterpoint[i + 2])/2, 0)
+                median = int(round((self.Counterpoint[i] + self.Counterpoint[i + 2]) / 2, 0))
 
+                # The steps are read from the tables in Fundamentals, which hold None past the edges of the staff, so the
+                # search always ends.  If it runs off the staff, the original pitch is kept.
                 if self.Counterpoint[i] > self.Counterpoint[i + 2]:
-                    PitchToCheck = self.Counterpoint[i] - median
+                    PitchToCheck = median if self.fundamentals.InMode(median) else self.fundamentals.StepDown(median)
 
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode and PitchToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                                PitchInMode = True
-                                break
-                        PitchToCheck -= 1
+                    while PitchToCheck is not None and PitchToCheck - self.Cantus[i + 1] not in self.fundamentals.ImperfectConsonantIntervals:
+                        PitchToCheck = self.fundamentals.StepDown(PitchToCheck)
 
+                else:
+                    PitchToCheck = median if self.fundamentals.InMode(median) else self.fundamentals.StepUp(median)
+
+                    while PitchToCheck is not None and PitchToCheck - self.Cantus[i + 1] not in self.fundamentals.ImperfectConsonantIntervals:
+                        PitchToCheck = self.fundamentals.StepUp(PitchToCheck)
+
+                if PitchToCheck is not None:
                     self.Counterpoint[i + 1] = PitchToCheck
+                    self.Rules[i + 1] = "Smoothing"
 
-                else:
-                    PitchToCheck = self.Counterpoint[i] + median
 
-                    PitchInMode = False
-                    while PitchInMode == False:
-                        for each in self.fundamentals.Pitches:
-                            if self.fundamentals.Pitches[each] == PitchToCheck and each[:-1] in self.fundamentals.Mode and PitchToCheck in self.fundamentals.ImperfectConsonantIntervals:
-                                PitchInMode = True
-                                break
-                        PitchToCheck += 1
+class RuleState():
+    """
+    This class keeps track of what the rules need to know about a counterpoint while it is being generated: the last pitch and
+    the interval it made with the cantus, how many perfect consonances have been used in a row, and the last leap, if the line
+    has just leapt.  Each pitch updates the state as it is added to the line, so checking a candidate never needs to look back
+    over the line, and takes the same time at every position.
+
+    The direction of the cantus into each position is worked out once, since the cantus never changes.  Directions are given as
+    1 for ascending, -1 for descending, and 0 for static.
+    """
+
+    __slots__ = ("Cantus", "CantusMotion", "Length", "LastPitch", "LastInterval", "ConsecutivePerfect", "LastLeap")
+
+    fundamentals = Fundamentals()
+
+    # A melodic interval larger than this (a major third) is a leap, and no leap may be larger than an octave
+    LargestStep = 4
+    LargestLeap = 12
+
+    def __init__(self, Cantus):
+        self.Cantus = Cantus
+        self.CantusMotion = [0] + [(Cantus[i] > Cantus[i - 1]) - (Cantus[i] < Cantus[i - 1]) for i in range(1, len(Cantus))]
+        self.Clear()
+
+    def Clear(self):
+        # Resets the state for a new counterpoint
+        self.Length = 0
+        self.LastPitch = None
+        self.LastInterval = None
+        self.ConsecutivePerfect = 0
+        self.LastLeap = 0
+
+    def Push(self, Pitch):
+        # Updates the state with the next pitch of the counterpoint
+        Interval = Pitch - self.Cantus[self.Length]
+
+        if self.LastPitch is not None:
+            Melodic = Pitch - self.LastPitch
+            self.LastLeap = Melodic if abs(Melodic) > self.LargestStep else 0
+
+        if Interval in self.fundamentals.PerfectConsonantIntervals:
+            self.ConsecutivePerfect += 1
+        else:
+            self.ConsecutivePerfect = 0
+
+        self.LastPitch = Pitch
+        self.LastInterval = Interval
+        self.Length += 1
+
+    def Save(self):
+        # Returns everything the state has learned from the line so far, so that a pitch can be tried and then taken back
+        return self.Length, self.LastPitch, self.LastInterval, self.ConsecutivePerfect, self.LastLeap
+
+    def Restore(self, Saved):
+        self.Length, self.LastPitch, self.LastInterval, self.ConsecutivePerfect, self.LastLeap = Saved
+
+    def Legal(self, Pitch):
+        """
+        This function checks whether a given pitch may be the next pitch of the counterpoint.  The counterpoint is the upper
+        voice, so only consonances above the cantus within the mode are used.  The line opens on a perfect consonance, and after
+        that:
+
+        Perfect consonances are never reached in parallel motion, and never follow another perfect consonance
+        Imperfect consonances are only reached in parallel motion from an imperfect consonance
+        No leap is larger than an octave or is a tritone, and every leap is followed by a change of direction
+        """
+
+        i = self.Length
+        if i >= len(self.Cantus) or not self.fundamentals.InMode(Pitch):
+            return False
+
+        Interval = Pitch - self.Cantus[i]
+        Perfect = Interval in self.fundamentals.PerfectConsonantIntervals
+
+        if i == 0:
+            return Perfect
+        if not Perfect and Interval not in self.fundamentals.ImperfectConsonantIntervals:
+            return False
+
+        Melodic = Pitch - self.LastPitch
+        Motion = (Melodic > 0) - (Melodic < 0)
+
+        # Parallel motion means both voices move the same way, or both stay where they are
+        if Motion == self.CantusMotion[i]:
+            if Perfect or self.LastInterval in self.fundamentals.PerfectConsonantIntervals:
+                return False
+
+        if Perfect and self.ConsecutivePerfect > 0:
+            return False
+
+        if abs(Melodic) > self.LargestLeap or abs(Melodic) == 6:
+            return False
+        if self.LastLeap and Motion * self.LastLeap >= 0:
+            return False
+
+        return True
+
+
+class ExerciseRecord():
+    """
+    This class holds a finished exercise as compactly as possible, for when millions of exercises need to be kept in memory
+    for analysis.  Every pitch fits within a single byte, so the cantus and counterpoint are stored as bytes rather than as
+    lists of Python integers, and the record has no instance dictionary.  Indexing or iterating over either line still gives
+    the pitch numbers, and a cantus already stored as bytes is shared rather than copied.
+    """
+
+    __slots__ = ("Version", "Species", "Mode", "Cantus", "Counterpoint")
+
+    def __init__(self, Version, Species, Mode, Cantus, Counterpoint):
+        self.Version = Version
+        self.Species = Species
+        self.Mode = Mode
+        self.Cantus = bytes(Cantus)
+        self.Counterpoint = bytes(Counterpoint)
 
-                    self.Counterpoint[i + 1] = PitchToCheck
\ No newline at end of file
+    def __repr__(self):
+        return "ExerciseRecord(%r, %r, %r, %r, %r)" % (self.Version, self.Species, self.Mode, list(self.Cantus), list(self.Counterpoint))
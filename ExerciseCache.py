@@ -0,0 +1,99 @@
+"""
+This file keeps generated exercises in a small SQLite database, so that an exercise asked for again with the same seed is read
+back rather than generated again.  Exercises are keyed by everything that decides what they will be: the version, species, and
+mode, the seed, the number of the line within the exercise's stream of lines, the beam width, and the version of the rules.
+When the cache grows past its limit, the exercises that have gone unused for longest are thrown away first.
+
+To use the cache, set Exercise.Cache to an ExerciseCache.  Only exercises created with a numeric seed are cached, since any other
+seed never gives the same exercise twice, and only for the versions in Exercise.CachedVersions, since the others generate a line
+in less time than it takes to look one up.
+"""
+
+# SQLite comes with Python, so the cache needs nothing else installed
+import sqlite3
+
+
+class ExerciseCache():
+    """
+    The cantus and counterpoint are stored as bytes, one byte per pitch, as they are in an ExerciseRecord, and the names of the
+    rules as a single string.  Every exercise also holds the number of the last time it was read or written, which is what
+    decides the order in which exercises are thrown away.
+    """
+
+    # The layout of the table, which is stored in the file so that a cache written in an older layout is started afresh
+    SchemaVersion = 2
+
+    def __init__(self, Path="ExerciseCache.sqlite", MaxEntries=100000):
+        self.MaxEntries = MaxEntries
+
+        # The connection commits every statement as it is run, and the write-ahead log lets several processes share the file
+        self.Connection = sqlite3.connect(Path, isolation_level=None)
+        self.Connection.execute("PRAGMA journal_mode=WAL")
+        self.Connection.execute("PRAGMA synchronous=NORMAL")
+        if self.Connection.execute("PRAGMA user_version").fetchone()[0] != self.SchemaVersion:
+            self.Connection.execute("DROP TABLE IF EXISTS Exercises")
+            self.Connection.execute("PRAGMA user_version=%d" % self.SchemaVersion)
+        self.Connection.execute("""
+            CREATE TABLE IF NOT EXISTS Exercises (
+                Version TEXT, Species INTEGER, Mode TEXT, Seed INTEGER, Line INTEGER, BeamWidth INTEGER, RuleSetVersion INTEGER,
+                Cantus BLOB, Counterpoint BLOB, Rules TEXT, LastUsed INTEGER,
+                PRIMARY KEY (Version, Species, Mode, Seed, Line, BeamWidth, RuleSetVersion)
+            )""")
+        self.Connection.execute("CREATE INDEX IF NOT EXISTS ExercisesByUse ON Exercises (LastUsed)")
+
+        # Each read or write is numbered, carrying on from the highest number already in the file
+        self.Clock = self.Connection.execute("SELECT COALESCE(MAX(LastUsed), 0) FROM Exercises").fetchone()[0]
+
+        # Old exercises are thrown away after every EvictionInterval writes, rather than after each one
+        self.EvictionInterval = 100
+        self.Writes = 0
+
+    def Tick(self):
+        # Returns the number of the next read or write
+        self.Clock += 1
+        return self.Clock
+
+    def Get(self, Version, Species, Mode, Seed, Line, BeamWidth, RuleSetVersion):
+        """
+        This function looks up an exercise.  It returns the cantus, the counterpoint, and the names of the rules as lists, or
+        None if the exercise has not been cached.
+        """
+
+        Key = (Version, Species, Mode, Seed, Line, BeamWidth, RuleSetVersion)
+        Row = self.Connection.execute("""
+            SELECT Cantus, Counterpoint, Rules FROM Exercises
+            WHERE Version = ? AND Species = ? AND Mode = ? AND Seed = ? AND Line = ? AND BeamWidth = ? AND RuleSetVersion = ?""", Key).fetchone()
+
+        if Row is None:
+            return None
+
+        self.Connection.execute("""
+            UPDATE Exercises SET LastUsed = ?
+            WHERE Version = ? AND Species = ? AND Mode = ? AND Seed = ? AND Line = ? AND BeamWidth = ? AND RuleSetVersion = ?""", (self.Tick(),) + Key)
+
+        Cantus, Counterpoint, Rules = Row
+        return list(Cantus), list(Counterpoint), Rules.split(",")
+
+    def Put(self, Version, Species, Mode, Seed, Line, BeamWidth, RuleSetVersion, Cantus, Counterpoint, Rules):
+        # Stores an exercise, and every so often throws away the least recently used exercises if there are too many
+        self.Connection.execute("INSERT OR REPLACE INTO Exercises VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            Version, Species, Mode, Seed, Line, BeamWidth, RuleSetVersion, bytes(Cantus), bytes(Counterpoint), ",".join(Rules), self.Tick()))
+
+        self.Writes += 1
+        if self.Writes % self.EvictionInterval == 0:
+            self.Evict()
+
+    def Evict(self):
+        # Throws away the least recently used exercises until no more than MaxEntries remain
+        self.Connection.execute("""
+            DELETE FROM Exercises WHERE LastUsed <= (
+                SELECT LastUsed FROM Exercises ORDER BY LastUsed DESC LIMIT 1 OFFSET ?
+            )""", (self.MaxEntries,))
+
+    def __len__(self):
+        return self.Connection.execute("SELECT COUNT(*) FROM Exercises").fetchone()[0]
+
+    def Close(self):
+        # Trims the cache to its limit and closes the file
+        self.Evict()
+        self.Connection.close()
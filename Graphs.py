@@ -7,14 +7,69 @@ for displaying the results.
 # This function requires the ability to graph
 from matplotlib import pyplot
 
+# Batches of graphs are drawn straight to files without opening a window, so they only need a figure and a non-interactive canvas
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Graphs can also be returned as bytes rather than written to files
+from io import BytesIO
+import os
+
 def Graph(Version, Species, Mode, Counterpoint, Cantus):
     Pitches = [i for i in range(len(Counterpoint))]
 
     print(Pitches)
-    print(Cantus)
+    print(list(Cantus))
     print(Counterpoint)
 
     pyplot.scatter(Pitches, Counterpoint)
     pyplot.scatter(Pitches, Cantus)
     pyplot.title(Version + ": " + "Species " + str(Species) + " in " + Mode + " Mode")
-    pyplot.show()
\ No newline at end of file
+    pyplot.show()
+
+def RenderBatch(Exercises, Directory=None, Format="png"):
+    """
+    This function draws the same scatterplot as Graph for a whole batch of exercises without displaying anything, so it can
+    run on a server with no screen.  Exercises is a sequence of (Version, Species, Mode, Counterpoint, Cantus) tuples, the same
+    arguments Graph takes.
+
+    A single figure is drawn on for every exercise; only the points and the title change from one exercise to the next.  If
+    a Directory is given, each graph is written there in the given format (such as 'png' or 'svg') and the list of file paths
+    is returned.  Otherwise the list of the files' contents is returned as bytes.
+    """
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    # The points are set for each exercise, so the plots start out empty
+    CounterpointPoints = axes.scatter([], [])
+    CantusPoints = axes.scatter([], [])
+
+    if Directory is not None:
+        os.makedirs(Directory, exist_ok=True)
+
+    Results = []
+    for n, (Version, Species, Mode, Counterpoint, Cantus) in enumerate(Exercises):
+        Pitches = [i for i in range(len(Counterpoint))]
+
+        CounterpointPoints.set_offsets(list(zip(Pitches, Counterpoint)))
+        CantusPoints.set_offsets(list(zip(Pitches, Cantus)))
+        axes.set_title(Version + ": " + "Species " + str(Species) + " in " + Mode + " Mode")
+
+        # Scatterplots are not rescaled when their points change, so the limits are set by hand
+        Lowest = min(min(Counterpoint), min(Cantus))
+        Highest = max(max(Counterpoint), max(Cantus))
+        axes.set_xlim(-1, len(Pitches))
+        axes.set_ylim(Lowest - 2, Highest + 2)
+
+        if Directory is None:
+            Output = BytesIO()
+            figure.savefig(Output, format=Format)
+            Results.append(Output.getvalue())
+        else:
+            Path = os.path.join(Directory, "%06d-%s-Species%d-%s.%s" % (n, Version, Species, Mode, Format))
+            figure.savefig(Path, format=Format)
+            Results.append(Path)
+
+    return Results
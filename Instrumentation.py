@@ -0,0 +1,155 @@
+"""
+This file measures where the iterations in Counterpoint.py spend their time.  While an exercise is being generated, it counts
+how many pitches are checked against the mode, how many steps are taken through the mode, and how many intervals are looked up
+in the lists of consonances, and it times every position of the line, grouped by the rule that chose the pitch there.  It also
+records how far down each iteration's ladder of rules it had to go before a pitch was found.
+
+Nothing is measured unless it is asked for, so generation is no slower when it is not in use.  To use it, set
+Exercise.Instrumentation to an Instrumentation.  Each exercise then leaves its measurements in its Metrics attribute, and the
+Instrumentation adds them up for every version it has seen.
+"""
+
+# The positions are timed with the most precise clock available
+from time import perf_counter
+
+from MusicFundamentals import Fundamentals
+
+
+# The rules of each iteration, in the order they are tried.  A pitch chosen by the first rule has a depth of one, by the second
+# a depth of two, and so on.  Pitches chosen by any other rule, such as the opening and the cadence, have a depth of zero.
+Ladders = {
+    "FirstIteration": ["ImperfectContrary", "PerfectContrary", "ImperfectParallel", "NotFound"],
+    "SecondIteration": ["ImperfectContrary", "PerfectContrary", "ImperfectParallel", "NotFound"],
+    "ThirdIteration": ["StepContrary", "StepParallel", "ImperfectContrary", "PerfectContrary", "ImperfectParallel", "NotFound"],
+    "FourthIteration": ["StepImperfect", "StepPerfect", "ImperfectContrary", "PerfectContrary", "ImperfectParallel", "NotFound"],
+    "FifthIteration": ["Step", "StepThird", "ParallelStep", "ParallelThird", "Imperfect", "Perfect", "NotFound"],
+    "StrictIteration": ["Imperfect", "Perfect", "NotFound"]
+}
+
+# The counters kept for every exercise
+CounterNames = ["ModeChecks", "Steps", "IntervalChecks"]
+
+
+class CountingList(list):
+    # A list of intervals that counts every time it is searched
+    def __init__(self, Intervals, Counters):
+        list.__init__(self, Intervals)
+        self.Counters = Counters
+
+    def __contains__(self, Interval):
+        self.Counters["IntervalChecks"] += 1
+        return list.__contains__(self, Interval)
+
+
+class CountingFundamentals(Fundamentals):
+    """
+    This class answers exactly as Fundamentals does, but counts the questions it is asked.  It takes the place of an
+    exercise's fundamentals while the exercise is being measured.
+    """
+
+    def __init__(self, Counters):
+        self.Counters = Counters
+        self.PerfectConsonantIntervals = CountingList(Fundamentals.PerfectConsonantIntervals, Counters)
+        self.ImperfectConsonantIntervals = CountingList(Fundamentals.ImperfectConsonantIntervals, Counters)
+        self.DissonantIntervals = CountingList(Fundamentals.DissonantIntervals, Counters)
+
+    def InMode(self, Pitch):
+        self.Counters["ModeChecks"] += 1
+        return Fundamentals.InMode(self, Pitch)
+
+    def StepUp(self, Pitch):
+        self.Counters["Steps"] += 1
+        return Fundamentals.StepUp(self, Pitch)
+
+    def StepDown(self, Pitch):
+        self.Counters["Steps"] += 1
+        return Fundamentals.StepDown(self, Pitch)
+
+
+class Instrumentation():
+    """
+    This class measures exercises as they are generated and adds up the measurements for each version.  The measurements of
+    a single exercise are a dictionary of:
+
+    Version         the version of the algorithm used
+    Positions       the number of positions in the line
+    ModeChecks      the number of times a pitch was checked against the mode
+    Steps           the number of steps taken through the mode
+    IntervalChecks  the number of times an interval was looked up in the lists of consonances
+    Candidates      the number of pitches tried, which is every pitch checked against the mode and every step taken
+    NotFound        the number of positions where no suitable pitch was found
+    Depths          the number of positions at each depth of the version's ladder of rules
+    MaxDepth        the deepest any position went
+    Time            the time taken to generate the line, in seconds
+    PhaseTimes      the time taken at the positions chosen by each rule, in seconds
+    """
+
+    def __init__(self):
+        self.Totals = {}
+
+    def Measure(self, EX, Version, Positions):
+        """
+        This function passes on the positions of a line as an exercise generates them, measuring each one along the way.  The
+        exercise counts its questions through a CountingFundamentals until the line is finished.
+        """
+
+        Counters = dict.fromkeys(CounterNames, 0)
+        Ladder = Ladders.get(Version, [])
+        Metrics = {"Version": Version, "Positions": 0, "Depths": {}, "MaxDepth": 0, "Time": 0.0, "PhaseTimes": {}}
+
+        EX.fundamentals = CountingFundamentals(Counters)
+        try:
+            Start = perf_counter()
+            for i in Positions:
+                Time = perf_counter() - Start
+
+                Rule = EX.Rules[i]
+                Depth = Ladder.index(Rule) + 1 if Rule in Ladder else 0
+                Metrics["Positions"] += 1
+                Metrics["Depths"][Depth] = Metrics["Depths"].get(Depth, 0) + 1
+                Metrics["MaxDepth"] = max(Metrics["MaxDepth"], Depth)
+                Metrics["Time"] += Time
+                Metrics["PhaseTimes"][Rule] = Metrics["PhaseTimes"].get(Rule, 0.0) + Time
+
+                yield i
+                Start = perf_counter()
+        finally:
+            # The exercise goes back to the fundamentals shared by every exercise
+            del EX.fundamentals
+
+        Metrics.update(Counters)
+        Metrics["Candidates"] = Counters["ModeChecks"] + Counters["Steps"]
+        Metrics["NotFound"] = EX.Rules.count("NotFound")
+
+        EX.Metrics = Metrics
+        self.Add(Metrics)
+
+    def Add(self, Metrics):
+        # Adds the measurements of a single exercise to the totals for its version
+        Total = self.Totals.setdefault(Metrics["Version"], {"Exercises": 0, "Depths": {}, "PhaseTimes": {}})
+        Total["Exercises"] += 1
+
+        for Name in CounterNames + ["Candidates", "NotFound", "Positions", "Time"]:
+            Total[Name] = Total.get(Name, 0) + Metrics[Name]
+        Total["MaxDepth"] = max(Total.get("MaxDepth", 0), Metrics["MaxDepth"])
+
+        for Depth, Count in Metrics["Depths"].items():
+            Total["Depths"][Depth] = Total["Depths"].get(Depth, 0) + Count
+        for Rule, Time in Metrics["PhaseTimes"].items():
+            Total["PhaseTimes"][Rule] = Total["PhaseTimes"].get(Rule, 0.0) + Time
+
+    def Summary(self):
+        """
+        This function returns the totals for each version, keyed by the name of the version, along with the average of each
+        counter per exercise, and the share of the time spent at the positions chosen by each rule.
+        """
+
+        Summary = {}
+        for Version, Total in self.Totals.items():
+            Summary[Version] = dict(Total)
+            Summary[Version]["PerExercise"] = {Name: Total[Name] / Total["Exercises"] for Name in CounterNames + ["Candidates", "NotFound", "Time"]}
+            Summary[Version]["PhaseShares"] = {Rule: Time / Total["Time"] if Total["Time"] else 0.0 for Rule, Time in Total["PhaseTimes"].items()}
+        return Summary
+
+    def Reset(self):
+        self.Totals = {}
@@ -1,13 +1,28 @@
 """
 This is the main function that will run all of the algorithms needed to generate a counterpoint exercise in the style of Fux.
-It is quite simple, and will simply run until stopped.
+Run without any arguments, it is quite simple, and will simply run until stopped.  Given arguments, it generates the requested
+exercises, writes them out, and exits, so that it can be used from scripts and shell pipelines.
 """
 
-# This file will need the Counterpoint class and the graphing function
+# This file will need the Counterpoint class, and the names of the modes from the Cantus Firmi class
 from Counterpoint import Exercise
+from CantusFirmi import CantusFirmus
 
-# The graphing function will also be needed
-from Graphs import Graph
+# The command line arguments are read with argparse, and the exercises are written as JSON
+import sys
+import json
+from argparse import ArgumentParser, ArgumentTypeError
+from contextlib import redirect_stdout
+
+def PositiveInteger(Text):
+    # Reads a command line argument that must be a whole number of at least one
+    Value = int(Text)
+    if Value < 1:
+        raise ArgumentTypeError("must be at least 1, not " + Text)
+    return Value
+
+# The graphing functions are only imported once a graph is actually requested, since loading matplotlib is by far the
+# slowest part of starting up
 
 def Main():
     """
@@ -16,10 +31,14 @@ def Main():
     scatterplot.
     """
 
-    # These dictionaries help prevent bugs by checking the input of the user before sending it to the functions
-    Versions = ["FirstIteration", "SecondIteration", "ThirdIteration", "FourthIteration", "FifthIteration"]
-    PossibleSpecies = [1, 2, 3, 4, 5]
-    Modes = ["Ionian", "Dorian", "Phrygian", "Lydian", "Mixolydian", "Aeolian"]
+    # The graphing function will also be needed
+    from Graphs import Graph
+
+    # These lists help prevent bugs by checking the input of the user before sending it to the functions.  They are the same
+    # lists the command line checks against, so every version can be reached from the prompt.
+    Versions = Exercise.Versions
+    PossibleSpecies = Exercise.PossibleSpecies
+    Modes = list(CantusFirmus.Modes)
 
     while True:
         # Ask the user to specify a version of the code, the desired species, and the desired mode for an exercise
@@ -51,5 +70,91 @@ def Main():
         print("\n\n")
 
 
+def CommandLine(Arguments):
+    """
+    This function generates the exercises requested on the command line.  Each exercise is written as one line of JSON, either
+    to the output file or to standard output, and messages from the algorithms are sent to standard error so that they never
+    mix with the results.
+    """
+
+    Parser = ArgumentParser(description="Generate counterpoint exercises in the style of Fux.  Run without arguments for the interactive prompt.")
+    Parser.add_argument("--version", required=True, choices=Exercise.Versions, help="the version of the algorithm to use")
+    Parser.add_argument("--species", required=True, type=int, choices=Exercise.PossibleSpecies, help="the species of counterpoint")
+    Parser.add_argument("--mode", required=True, choices=list(CantusFirmus.Modes), help="the mode of the cantus firmus")
+    Parser.add_argument("--count", type=PositiveInteger, default=1, help="the number of exercises to generate")
+    Parser.add_argument("--seed", type=int, default=None, help="a seed that makes the exercises reproducible")
+    Parser.add_argument("--width", type=PositiveInteger, default=None, help="the number of partial lines kept by BeamIteration (%d by default)" % Exercise.BeamWidth)
+    Parser.add_argument("--cache", metavar="FILE", help="read exercises from and save them to this SQLite cache (only with --seed, and only for %s)" % " and ".join(Exercise.CachedVersions))
+    Parser.add_argument("--transitions", metavar="FILE", default=Exercise.TransitionPath, help="the file the legal moves of each mode are saved in and read from (%s in the working directory by default)" % Exercise.TransitionPath)
+    Parser.add_argument("--output", default="-", help="the file to write the exercises to, one JSON object per line (standard output by default)")
+    Parser.add_argument("--graph", action="store_true", help="display a graph of each exercise")
+    Parser.add_argument("--render", metavar="DIRECTORY", help="write a graph of each exercise to this directory without displaying it")
+    Parser.add_argument("--stream", action="store_true", help="write each pitch as one line of JSON as soon as it is chosen, rather than each exercise once it is finished")
+    Parser.add_argument("--midi", metavar="PATH", help="write each exercise as a MIDI file to this directory, or to this archive if it ends in .zip")
+    Options = Parser.parse_args(Arguments)
+
+    Exercise.TransitionPath = Options.transitions
+
+    if Options.cache:
+        from ExerciseCache import ExerciseCache
+        Exercise.Cache = ExerciseCache(Options.cache)
+
+    Output = sys.stdout if Options.output == "-" else open(Options.output, "w")
+    Rendered = []
+
+    # MIDI files are written as each exercise is generated
+    if Options.midi:
+        from MidiExport import MidiWriter
+        Midi = MidiWriter(Options.midi)
+
+    # A single exercise is reused for every line, so one seed gives one reproducible stream of exercises.  No line is generated
+    # when it is created, so that even the first line is streamed as it is chosen.
+    EX = Exercise(Options.version, Options.species, Options.mode, Options.seed, Options.width, Generate=False)
+
+    for n in range(Options.count):
+        with redirect_stdout(sys.stderr):
+            for i, Cantus, Counterpoint, Rule in EX.Stream(Options.version):
+                if Options.stream:
+                    Output.write(json.dumps({"Exercise": n, "Position": i, "Cantus": Cantus, "Counterpoint": Counterpoint, "Rule": Rule}) + "\n")
+                    Output.flush()
+
+        if not Options.stream:
+            Output.write(json.dumps({
+                "Version": Options.version,
+                "Species": Options.species,
+                "Mode": Options.mode,
+                "Cantus": list(EX.Cantus),
+                "Counterpoint": list(EX.Counterpoint)
+            }) + "\n")
+
+        if Options.graph:
+            from Graphs import Graph
+            with redirect_stdout(sys.stderr):
+                Graph(Options.version, Options.species, Options.mode, EX.Counterpoint, EX.Cantus)
+
+        if Options.midi:
+            Midi.Write(Options.version, Options.species, Options.mode, EX.Counterpoint, EX.Cantus)
+
+        if Options.render:
+            Rendered.append((Options.version, Options.species, Options.mode, list(EX.Counterpoint), list(EX.Cantus)))
+
+    if Output is not sys.stdout:
+        Output.close()
+
+    if Options.midi:
+        Midi.Close()
+
+    if Exercise.Cache is not None:
+        Exercise.Cache.Close()
+
+    if Options.render:
+        from Graphs import RenderBatch
+        RenderBatch(Rendered, Options.render)
+
+
 # This calls the main function
-Main()
\ No newline at end of file
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        CommandLine(sys.argv[1:])
+    else:
+        Main()
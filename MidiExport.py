@@ -0,0 +1,166 @@
+"""
+This file writes counterpoint exercises as standard MIDI files, so that they can be played back rather than only graphed.  Each
+exercise becomes a file with two tracks, the cantus firmus and the counterpoint.  Exercises are written one at a time as they
+arrive, either as separate files in a directory or as entries of a single zip archive, so that any number of them can be
+exported without holding them all in memory.
+"""
+
+# MIDI files are made of big-endian binary numbers
+import struct
+
+# Many exercises can be kept in a single archive
+import zipfile
+import os
+
+# A corpus is read as JSON, one exercise per line, and exported from the command line
+import json
+from argparse import ArgumentParser
+
+# The number of times each cantus pitch is repeated decides how long each note lasts
+from CantusFirmi import CantusFirmus
+
+
+# Pitch 0 (C2) is MIDI note 36
+LowestNote = 36
+
+# The number of ticks in a quarter note, and so in the whole note that each pitch of the cantus lasts
+TicksPerQuarter = 480
+WholeNote = 4 * TicksPerQuarter
+
+# The tempo, in microseconds per quarter note
+Tempo = 500000
+
+Velocity = 80
+
+
+def MidiNote(Pitch):
+    # Returns the MIDI note number of a pitch, as numbered in MusicFundamentals.py
+    return Pitch + LowestNote
+
+
+def VariableLength(Value):
+    # Times within a MIDI track are written seven bits to a byte, with the top bit set on every byte but the last
+    Bytes = [Value & 0x7F]
+    Value >>= 7
+    while Value:
+        Bytes.append(0x80 | (Value & 0x7F))
+        Value >>= 7
+    return bytes(reversed(Bytes))
+
+
+def Track(Name, Notes, Channel, Tempo=None):
+    """
+    This function returns a single MIDI track holding a list of (Pitch, Ticks) notes played one after the other on the given
+    channel.  A pitch of 0, which marks a position where no suitable pitch was found, is left as a rest.
+    """
+
+    Events = bytearray()
+    Events += b"\x00\xff\x03" + VariableLength(len(Name)) + Name.encode()
+    if Tempo is not None:
+        Events += b"\x00\xff\x51\x03" + Tempo.to_bytes(3, "big")
+
+    Rest = 0
+    for Pitch, Ticks in Notes:
+        if Pitch == 0:
+            Rest += Ticks
+            continue
+
+        Events += VariableLength(Rest) + bytes([0x90 | Channel, MidiNote(Pitch), Velocity])
+        Events += VariableLength(Ticks) + bytes([0x80 | Channel, MidiNote(Pitch), 0])
+        Rest = 0
+
+    Events += VariableLength(Rest) + b"\xff\x2f\x00"
+    return b"MTrk" + struct.pack(">I", len(Events)) + bytes(Events)
+
+
+def MidiFile(Version, Species, Mode, Counterpoint, Cantus):
+    """
+    This function returns the contents of a MIDI file for one exercise, taking the same arguments as Graph.  Each pitch of the
+    cantus lasts a whole note, and the counterpoint fills it with one, two, or four notes, depending on the species.  Since the
+    cantus is given as it is returned by GetCantus, with every pitch repeated for each counterpoint note, the repeats are
+    joined back into a single whole note.
+    """
+
+    Repeat = CantusFirmus.Repeats[Species]
+
+    CantusNotes = [(Cantus[i], WholeNote) for i in range(0, len(Cantus), Repeat)]
+    CounterpointNotes = [(Pitch, WholeNote // Repeat) for Pitch in Counterpoint]
+
+    Header = b"MThd" + struct.pack(">IHHH", 6, 1, 2, TicksPerQuarter)
+    return (Header + Track("Cantus Firmus (" + Mode + ")", CantusNotes, 0, Tempo)
+            + Track("Counterpoint (" + Version + ", Species " + str(Species) + ")", CounterpointNotes, 1))
+
+
+class MidiWriter():
+    """
+    This class writes exercises as MIDI files as they are handed to it.  If the Path ends in '.zip', every exercise is added to
+    a single zip archive at that path; otherwise each is written as its own file in the directory at that path.  The files are
+    numbered and named in the same way as the graphs written by RenderBatch.  The writer can be used in a 'with' statement, so
+    that the archive is always finished.
+    """
+
+    def __init__(self, Path):
+        self.Path = Path
+        self.Written = 0
+
+        if Path.endswith(".zip"):
+            self.Archive = zipfile.ZipFile(Path, "w", zipfile.ZIP_DEFLATED)
+        else:
+            self.Archive = None
+            os.makedirs(Path, exist_ok=True)
+
+    def Write(self, Version, Species, Mode, Counterpoint, Cantus):
+        # Writes a single exercise and returns the name it was written under
+        Name = "%06d-%s-Species%d-%s.mid" % (self.Written, Version, Species, Mode)
+        Contents = MidiFile(Version, Species, Mode, Counterpoint, Cantus)
+
+        if self.Archive is not None:
+            self.Archive.writestr(Name, Contents)
+        else:
+            Name = os.path.join(self.Path, Name)
+            with open(Name, "wb") as File:
+                File.write(Contents)
+
+        self.Written += 1
+        return Name
+
+    def Close(self):
+        if self.Archive is not None:
+            self.Archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Exception):
+        self.Close()
+
+
+def ExportBatch(Exercises, Path):
+    """
+    This function writes every exercise of a batch to the directory or zip archive at Path and returns the number written.
+    Exercises is an iterable of (Version, Species, Mode, Counterpoint, Cantus) tuples, as for RenderBatch, and is read one
+    exercise at a time, so it can be a generator over a corpus of any size.
+    """
+
+    with MidiWriter(Path) as Writer:
+        for Version, Species, Mode, Counterpoint, Cantus in Exercises:
+            Writer.Write(Version, Species, Mode, Counterpoint, Cantus)
+    return Writer.Written
+
+
+def ReadCorpus(Path):
+    # Reads the exercises of a corpus written by Corpus.py or Main.py, one line at a time
+    with open(Path) as File:
+        for Line in File:
+            Record = json.loads(Line)
+            yield Record["Version"], Record["Species"], Record["Mode"], Record["Counterpoint"], Record["Cantus"]
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Export a corpus of counterpoint exercises as MIDI files.")
+    Parser.add_argument("Corpus", help="a file written by Corpus.py or Main.py, one JSON object per line")
+    Parser.add_argument("Output", help="a directory to write one MIDI file per exercise to, or a path ending in .zip for a single archive")
+    Arguments = Parser.parse_args()
+
+    Written = ExportBatch(ReadCorpus(Arguments.Corpus), Arguments.Output)
+    print(str(Written) + " exercises written to " + Arguments.Output)
@@ -84,6 +84,70 @@ class Fundamentals():
 
     Mode = ["A", "B", "C", "D", "E", "F", "G"]
 
+    """
+    Checking whether a pitch belongs to the mode by scanning the dictionary above and slicing each name is far too slow for
+    the inner loops of the counterpoint generators, so the answers are worked out once, when this class is first defined.
+    PitchNames maps each pitch number back to its name, ModeMask holds one bit per pitch (bit 0 for C2, bit 47 for B5) that is
+    set when the pitch is within the mode, and PitchesInMode holds the same answers as a list of booleans indexed by pitch
+    number.
+    """
+
+    PitchNames = sorted(Pitches, key=Pitches.get)
+
+    ModeMask = 0
+    PitchesInMode = []
+    for Name in PitchNames:
+        PitchesInMode.append(Name[:-1] in Mode)
+        if Name[:-1] in Mode:
+            ModeMask |= 1 << Pitches[Name]
+    del Name
+
+    """
+    The generators frequently need the next pitch within the mode above or below a given pitch.  Rather than adding or
+    subtracting half steps until a pitch within the mode turns up, which never ends once the search leaves the grand staff,
+    the answers are stored in two lists indexed by pitch number.  NoStep (None) marks the edges of the staff, where there is no
+    further pitch within the mode.  All six modes share the pitches in Mode, so the same tables serve every cantus firmus.
+    """
+
+    NoStep = None
+
+    StepsUp = [NoStep] * len(PitchNames)
+    StepsDown = [NoStep] * len(PitchNames)
+    for Pitch in range(1, len(PitchNames)):
+        StepsDown[Pitch] = Pitch - 1 if PitchesInMode[Pitch - 1] else StepsDown[Pitch - 1]
+    for Pitch in range(len(PitchNames) - 2, -1, -1):
+        StepsUp[Pitch] = Pitch + 1 if PitchesInMode[Pitch + 1] else StepsUp[Pitch + 1]
+    del Pitch
+
+    """
+    Reducing an interval with a loop and then searching the three lists of intervals above for it is slow when it is done for
+    every pitch of every line, so the answers for every pair of pitches on the grand staff are also worked out once.
+    ClassesByInterval holds the class ('P', 'I', or 'D') of every interval from a unison to an octave, Intervals[A][B] holds the
+    interval between pitches A and B reduced to within an octave, and IntervalClasses[A][B] holds its class.  The same tables
+    can be had as NumPy arrays from IntervalArrays, so that a whole line can be classified with a single lookup.
+    """
+
+    ClassesByInterval = [None] * 13
+    for Interval in PerfectConsonantIntervals:
+        ClassesByInterval[Interval] = 'P'
+    for Interval in ImperfectConsonantIntervals:
+        ClassesByInterval[Interval] = 'I'
+    for Interval in DissonantIntervals:
+        ClassesByInterval[Interval] = 'D'
+
+    Intervals = []
+    IntervalClasses = []
+    for A in range(len(PitchNames)):
+        Intervals.append([])
+        IntervalClasses.append([])
+        for B in range(len(PitchNames)):
+            Intervals[A].append(abs(A - B) % 12)
+            IntervalClasses[A].append(ClassesByInterval[abs(A - B) % 12])
+    del A, B, Interval
+
+    # The NumPy versions of the tables are only made when they are first asked for
+    Arrays = None
+
 
     def CalculateInterval(self, A, B):
         """
@@ -91,6 +155,10 @@ class Fundamentals():
         the bass reduced to be within an octave.
         """
 
+        # Pitches on the grand staff can be looked up directly
+        if 0 <= A < len(self.Intervals) and 0 <= B < len(self.Intervals):
+            return self.Intervals[A][B]
+
         # Find the interval from the bass
         if A >= B:
             Interval = A - B
@@ -105,9 +173,53 @@ class Fundamentals():
         return Interval
 
     def IntervalClass(self, Interval):
-        if Interval in self.PerfectConsonantIntervals:
-            return 'P'
-        elif Interval in self.ImperfectConsonantIntervals:
-            return 'I'
-        elif Interval in self.DissonantIntervals:
-            return 'D'
\ No newline at end of file
+        # Returns 'P', 'I', or 'D' for an interval from a unison to an octave, and None for any other interval
+        if 0 <= Interval < len(self.ClassesByInterval):
+            return self.ClassesByInterval[Interval]
+
+    def IntervalArrays(self):
+        """
+        This function returns the tables of intervals and interval classes as a pair of 48 by 48 NumPy arrays, so that whole
+        lines can be looked up at once.  For example, IntervalArrays()[1][Counterpoint, Cantus] gives the class of every interval
+        of a line.  The arrays are made the first time they are asked for and shared from then on, so they are read-only.
+        """
+
+        if Fundamentals.Arrays is None:
+            import numpy
+
+            Intervals = numpy.array(self.Intervals, dtype=numpy.int8)
+            IntervalClasses = numpy.array(self.IntervalClasses, dtype="U1")
+            Intervals.flags.writeable = False
+            IntervalClasses.flags.writeable = False
+            Fundamentals.Arrays = (Intervals, IntervalClasses)
+
+        return Fundamentals.Arrays
+
+    def InMode(self, Pitch):
+        """
+        This function checks whether a given pitch number is within the mode.  Pitches outside of the grand staff (below C2
+        or above B5) are never within the mode.
+        """
+        return 0 <= Pitch < len(self.PitchesInMode) and self.PitchesInMode[Pitch]
+
+    def PitchName(self, Pitch):
+        # Returns the name of a given pitch number, such as 'C4' for 24
+        return self.PitchNames[Pitch]
+
+    def StepUp(self, Pitch):
+        """
+        This function returns the next pitch within the mode above a given pitch, or NoStep if there is none on the grand staff.
+        NoStep is passed through unchanged, so steps can be chained.
+        """
+        if Pitch is self.NoStep or not 0 <= Pitch < len(self.StepsUp):
+            return self.NoStep
+        return self.StepsUp[Pitch]
+
+    def StepDown(self, Pitch):
+        """
+        This function returns the next pitch within the mode below a given pitch, or NoStep if there is none on the grand staff.
+        NoStep is passed through unchanged, so steps can be chained.
+        """
+        if Pitch is self.NoStep or not 0 <= Pitch < len(self.StepsDown):
+            return self.NoStep
+        return self.StepsDown[Pitch]
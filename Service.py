@@ -0,0 +1,281 @@
+"""
+This file serves counterpoint exercises over HTTP, so that they can be generated for a web page rather than at the interactive
+prompt in Main.py.  The server answers requests with asyncio, so that it never waits on any one of them, and the exercises
+themselves are generated by a pool of worker processes.  Each exercise is sent back as soon as its batch is finished, as one
+line of JSON, in the same form as the command line of Main.py writes.
+
+A request looks like
+    GET /generate?version=FifthIteration&species=1&mode=Dorian&count=10&seed=4
+or a POST to /generate with the same fields as a JSON object.  The count and seed may be left out, as may the width, the number
+of partial lines kept by BeamIteration.
+
+The server protects itself from being overwhelmed: it accepts only so many requests at once and turns any more away with '503
+Service Unavailable', only so many batches are handed to the workers at once, and no request may ask for more than a set number
+of exercises.  Results are only generated as fast as the client reads them.
+"""
+
+# The server is written with asyncio, and the exercises are generated in other processes
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from collections import deque
+
+# Requests and results are JSON
+import json
+from urllib.parse import urlsplit, parse_qsl
+
+# The "Failed to find a pitch" messages of the workers are kept out of the server's output
+import os
+import sys
+from contextlib import redirect_stdout
+
+# Every batch of a seeded request is given its own stream of random numbers, as in Corpus.py
+from numpy.random import SeedSequence
+
+# The server is started from the command line
+from argparse import ArgumentParser
+
+from Counterpoint import Exercise
+from CantusFirmi import CantusFirmus
+
+
+def GenerateLines(Version, Species, Mode, Size, Seed, BeamWidth):
+    # Generates a batch of exercises in a worker process, returning the counterpoints as lists
+    with open(os.devnull, "w") as Silence, redirect_stdout(Silence):
+        return Exercise.Batch(Version, Species, Mode, Size, Seed, BeamWidth).tolist()
+
+
+class RequestError(Exception):
+    # Raised for a request that cannot be answered, along with the HTTP status to answer it with
+    def __init__(self, Status, Message):
+        Exception.__init__(self, Message)
+        self.Status = Status
+
+
+class GenerationService():
+    """
+    This class holds the state of the server: the pool of workers and the limits on the work it will take on.  Requests for
+    more than ChunkSize exercises are split into batches of ChunkSize, and at most Window batches of any one request are
+    generated ahead of what has been sent to the client.
+    """
+
+    Statuses = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+    def __init__(self, Processes=None, MaxRequests=64, MaxCount=10000, ChunkSize=50, Window=2):
+        # The workers are started as fresh processes rather than forked, since they are started while requests are being
+        # answered, and a forked worker would keep those connections open after the server had closed them
+        self.Pool = ProcessPoolExecutor(Processes, mp_context=get_context("spawn"))
+        self.MaxRequests = MaxRequests
+        self.MaxCount = MaxCount
+        self.ChunkSize = ChunkSize
+        self.Window = Window
+
+        # The number of requests being answered, and the number of batches that may be handed to the workers at once
+        self.Requests = 0
+        self.Slots = asyncio.Semaphore(2 * (Processes or os.cpu_count() or 1))
+
+        # The cantus of each species and mode is the same for every exercise, so it is only turned into a list once
+        CF = CantusFirmus()
+        self.Cantus = {}
+        for Species in Exercise.PossibleSpecies:
+            for Mode in CF.Modes:
+                self.Cantus[Species, Mode] = list(CF.GetCantus(Species, Mode))
+
+    def ParseRequest(self, Method, Target, Body):
+        # Checks a request and returns the version, species, mode, count, seed, and beam width it asks for
+        Address = urlsplit(Target)
+        if Address.path != "/generate":
+            raise RequestError(404, "the only address is /generate")
+
+        if Method == "GET":
+            Fields = dict(parse_qsl(Address.query))
+        elif Method == "POST":
+            try:
+                Fields = json.loads(Body or b"{}")
+            except ValueError:
+                raise RequestError(400, "the body is not valid JSON")
+            if not isinstance(Fields, dict):
+                raise RequestError(400, "the body must be a JSON object")
+        else:
+            raise RequestError(405, "only GET and POST are supported")
+
+        try:
+            Version = Fields["version"]
+            Species = int(Fields["species"])
+            Mode = Fields["mode"]
+            Count = int(Fields.get("count", 1))
+            Seed = None if Fields.get("seed") is None else int(Fields["seed"])
+            Width = None if Fields.get("width") is None else int(Fields["width"])
+        except KeyError as Missing:
+            raise RequestError(400, "missing field " + str(Missing))
+        except (TypeError, ValueError):
+            raise RequestError(400, "species, count, seed, and width must be whole numbers")
+
+        if Version not in Exercise.Versions:
+            raise RequestError(400, "unknown version " + repr(Version))
+        if Species not in Exercise.PossibleSpecies:
+            raise RequestError(400, "unknown species " + repr(Species))
+        if Mode not in CantusFirmus.Modes:
+            raise RequestError(400, "unknown mode " + repr(Mode))
+        if not 1 <= Count <= self.MaxCount:
+            raise RequestError(400, "count must be between 1 and " + str(self.MaxCount))
+        if Seed is not None and Seed < 0:
+            raise RequestError(400, "seed must not be negative")
+        if Width is not None and Width < 1:
+            raise RequestError(400, "width must be at least 1")
+
+        return Version, Species, Mode, Count, Seed, Width
+
+    def Batches(self, Version, Species, Mode, Count, Seed, Width):
+        # Splits a request into batches, each with its own seed spawned from the request's seed, if it has one
+        for Index, Start in enumerate(range(0, Count, self.ChunkSize)):
+            ChunkSeed = None if Seed is None else int(SeedSequence(Seed, spawn_key=(Index,)).generate_state(1)[0])
+            yield Version, Species, Mode, min(self.ChunkSize, Count - Start), ChunkSeed, Width
+
+    async def Submit(self, Batch):
+        """
+        This function hands a batch to the workers once there is room for it, and returns a future for its lines.  The room is
+        only freed once the worker has actually finished the batch, or the batch has been cancelled before a worker took it.
+        Cancelling the future returned does not stop a worker that has already started, so if the room were freed with it, a
+        client that went away could leave more batches running than there are slots.
+        """
+
+        await self.Slots.acquire()
+        Loop = asyncio.get_running_loop()
+        try:
+            Work = self.Pool.submit(GenerateLines, *Batch)
+        except BaseException:
+            self.Slots.release()
+            raise
+
+        # The worker's future is finished in another thread, so the slot is released back in the event loop's own thread
+        Work.add_done_callback(lambda Done: Loop.call_soon_threadsafe(self.Slots.release))
+        return asyncio.wrap_future(Work, loop=Loop)
+
+    async def Stream(self, Writer, Version, Species, Mode, Count, Seed, Width):
+        """
+        This function sends the exercises of a request as they are generated, one line of JSON each, in chunked encoding.  A
+        few batches are kept in the workers ahead of what has been sent, and no more are started until the client has read
+        what it has been sent, so a slow client only ever holds back its own request.
+        """
+
+        Writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        Batches = self.Batches(Version, Species, Mode, Count, Seed, Width)
+        Pending = deque()
+        try:
+            for Batch in Batches:
+                Pending.append(await self.Submit(Batch))
+                if len(Pending) < self.Window:
+                    continue
+
+                await self.Send(Writer, Version, Species, Mode, await Pending.popleft())
+
+            while Pending:
+                await self.Send(Writer, Version, Species, Mode, await Pending.popleft())
+
+            Writer.write(b"0\r\n\r\n")
+            await Writer.drain()
+        finally:
+            # If the client has gone away, or a batch has failed, the batches that have not been started are not needed, and
+            # any that have already failed are looked at so that their errors are not reported again as never retrieved
+            for Future in Pending:
+                if not Future.cancel() and not Future.cancelled():
+                    Future.exception()
+
+    async def Send(self, Writer, Version, Species, Mode, Lines):
+        # Sends a batch of exercises as a single chunk, and waits until the client has taken it
+        Chunk = "".join(json.dumps({
+            "Version": Version,
+            "Species": Species,
+            "Mode": Mode,
+            "Cantus": self.Cantus[Species, Mode],
+            "Counterpoint": Line
+        }) + "\n" for Line in Lines).encode()
+
+        Writer.write(b"%x\r\n" % len(Chunk) + Chunk + b"\r\n")
+        await Writer.drain()
+
+    def Reply(self, Writer, Status, Message):
+        # Sends a short JSON answer, for requests that are not answered with exercises
+        Body = json.dumps({"Error": Message}).encode() + b"\n"
+        Writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n" % (Status, self.Statuses[Status].encode(), len(Body)))
+        if Status == 503:
+            Writer.write(b"Retry-After: 1\r\n")
+        Writer.write(b"\r\n" + Body)
+
+    async def Handle(self, Reader, Writer):
+        # Answers a single connection, which carries a single request
+        self.Requests += 1
+        RequestLine = []
+        Started = False
+        try:
+            RequestLine = (await Reader.readline()).decode("latin-1").split()
+            Headers = {}
+            while True:
+                Line = (await Reader.readline()).decode("latin-1")
+                if Line in ("\r\n", "\n", ""):
+                    break
+                Name, Separator, Value = Line.partition(":")
+                Headers[Name.strip().lower()] = Value.strip()
+
+            if len(RequestLine) != 3:
+                raise RequestError(400, "malformed request line")
+
+            Body = b""
+            if "content-length" in Headers:
+                if not Headers["content-length"].isdigit():
+                    raise RequestError(400, "malformed Content-Length")
+                Body = await Reader.readexactly(int(Headers["content-length"]))
+
+            if self.Requests > self.MaxRequests:
+                raise RequestError(503, "too many requests, try again shortly")
+
+            Request = self.ParseRequest(RequestLine[0], RequestLine[1], Body)
+            Started = True
+            await self.Stream(Writer, *Request)
+
+        except RequestError as Error:
+            self.Reply(Writer, Error.Status, str(Error))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as Error:
+            # Once the exercises have started to be sent, the status can no longer be changed, so the connection is closed
+            # without the last chunk and the client can see that the answer was cut short
+            print("Failed to answer " + " ".join(RequestLine) + ": " + repr(Error), file=sys.stderr)
+            if not Started:
+                self.Reply(Writer, 500, "the exercises could not be generated")
+        finally:
+            self.Requests -= 1
+            try:
+                await Writer.drain()
+                Writer.close()
+                await Writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def Serve(self, Host, Port):
+        Server = await asyncio.start_server(self.Handle, Host, Port)
+        print("Serving counterpoint exercises on http://%s:%d/generate" % (Host, Port))
+        async with Server:
+            await Server.serve_forever()
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Serve counterpoint exercises over HTTP.")
+    Parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    Parser.add_argument("--port", type=int, default=8000, help="the port to listen on")
+    Parser.add_argument("--processes", type=int, default=None, help="the number of worker processes (one per processor by default)")
+    Parser.add_argument("--max-requests", type=int, default=64, help="the number of requests answered at once before more are turned away")
+    Parser.add_argument("--max-count", type=int, default=10000, help="the largest number of exercises a single request may ask for")
+    Arguments = Parser.parse_args()
+
+    async def Main():
+        # The service is made inside the event loop, so that its limits belong to that loop
+        Service = GenerationService(Arguments.processes, Arguments.max_requests, Arguments.max_count)
+        await Service.Serve(Arguments.host, Arguments.port)
+
+    try:
+        asyncio.run(Main())
+    except KeyboardInterrupt:
+        pass
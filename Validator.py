@@ -0,0 +1,140 @@
+"""
+This file checks finished counterpoints against the rules of Fux.  The generators in Counterpoint.py choose each pitch by the
+rules, but nothing checks the line once it is finished.  Rather than checking one exercise at a time, every exercise of a batch
+is kept in a single NumPy array and each rule is checked for all of them at once, so that a whole corpus can be audited.
+
+Every position is held to the rules of first species, as the generators themselves are.
+"""
+
+# NumPy does the work of checking every exercise together
+import numpy
+
+# The corpus is read as JSON, one exercise per line
+import json
+
+# The audit is run from the command line
+from argparse import ArgumentParser
+
+# The same fundamentals are used as in Counterpoint.py
+from MusicFundamentals import Fundamentals
+
+fundamentals = Fundamentals()
+
+# These are the rules that are checked, in the order they are reported
+RuleNames = ["NotFound", "Dissonance", "ParallelPerfect", "DirectPerfect", "OutOfMode", "Range", "Cadence"]
+
+# These lookup tables are indexed by a pair of pitch numbers, by a reduced interval, or by a single pitch number.  The classes
+# are kept as booleans rather than as the letters of Fundamentals.IntervalClasses, since comparing a whole array of letters
+# is far slower than reading a boolean for each interval.
+Intervals = fundamentals.IntervalArrays()[0]
+Perfect = numpy.array([Class == 'P' for Class in fundamentals.ClassesByInterval])
+Dissonant = numpy.array([Class == 'D' for Class in fundamentals.ClassesByInterval])
+InMode = numpy.array(fundamentals.PitchesInMode, dtype=bool)
+
+
+def Validate(Cantus, Counterpoint):
+    """
+    This function checks a batch of counterpoints against the rules.  Counterpoint is a two dimensional array with one row per
+    exercise and one column per position, as returned by Exercise.Batch.  Cantus is either an array of the same shape, or a
+    single cantus shared by every row.  A single counterpoint may also be given on its own.
+
+    A dictionary is returned with one entry for each name in RuleNames.  Each entry is an array of booleans with one value per
+    exercise, which is True where the exercise breaks that rule:
+
+    NotFound        a 0 marks a position where the generator found no suitable pitch
+    Dissonance      a dissonant interval is sounded against the cantus
+    ParallelPerfect a fifth, octave, or unison is followed by the same interval, both voices moving in the same direction
+    DirectPerfect   a perfect consonance is reached by both voices moving in the same direction from a different interval
+    OutOfMode       a pitch is not within the mode, other than the raised leading tone of the cadence
+    Range           a pitch is off the grand staff, or the counterpoint falls below the cantus
+    Cadence         the line does not end on a sixth rising by step to an octave or unison
+
+    Positions marked with a 0 are only reported as NotFound, and pitches off the grand staff only as Range, and both are left
+    out of every other rule.
+    """
+
+    Counterpoint = numpy.atleast_2d(numpy.asarray(Counterpoint)).astype(numpy.int16)
+    Cantus = numpy.broadcast_to(numpy.asarray(Cantus, dtype=numpy.int16), Counterpoint.shape)
+
+    Found = Counterpoint != 0
+    OnStaff = (Counterpoint >= 0) & (Counterpoint < len(InMode))
+    Checked = Found & OnStaff
+    OnStaffPitch = numpy.where(OnStaff, Counterpoint, 0)
+
+    # The interval from the cantus at each position, and the same interval reduced to within an octave
+    Interval = Counterpoint - Cantus
+    Reduced = Intervals[OnStaffPitch, Cantus]
+
+    # The direction each voice moves in from one position to the next, and whether both pitches of each pair were found
+    CantusMotion = numpy.sign(numpy.diff(Cantus, axis=1))
+    CounterpointMotion = numpy.sign(numpy.diff(Counterpoint, axis=1))
+    Similar = (CantusMotion == CounterpointMotion) & (CantusMotion != 0)
+    PairFound = Checked[:, 1:] & Checked[:, :-1]
+    IntoPerfect = Perfect[Reduced[:, 1:]] & Similar & PairFound
+    SameInterval = Reduced[:, 1:] == Reduced[:, :-1]
+
+    Flags = {}
+    Flags["NotFound"] = ~Found.all(axis=1)
+    Flags["Dissonance"] = (Dissonant[Reduced] & Checked).any(axis=1)
+    Flags["ParallelPerfect"] = (IntoPerfect & SameInterval).any(axis=1)
+    Flags["DirectPerfect"] = (IntoPerfect & ~SameInterval).any(axis=1)
+
+    # The penultimate pitch is a major sixth above the cantus, which may raise it out of the mode as a leading tone
+    OutOfMode = ~InMode[OnStaffPitch] & Checked
+    OutOfMode[:, -2] = False
+    Flags["OutOfMode"] = OutOfMode.any(axis=1)
+    Flags["Range"] = ((~OnStaff | (Interval < 0)) & Found).any(axis=1)
+
+    # The penultimate interval must be a sixth and the last an octave or unison, with the counterpoint rising by step into it
+    Approach = Counterpoint[:, -1] - Counterpoint[:, -2]
+    Flags["Cadence"] = (Reduced[:, -2] != 9) | (Reduced[:, -1] != 0) | (Approach < 1) | (Approach > 2)
+
+    return Flags
+
+
+def Summary(Flags):
+    # Returns the number of exercises that break each rule, and the number that break any rule at all
+    Counts = {Name: int(Flags[Name].sum()) for Name in RuleNames}
+    Counts["Any"] = int(numpy.logical_or.reduce([Flags[Name] for Name in RuleNames]).sum())
+    return Counts
+
+
+def AuditCorpus(Path):
+    """
+    This function audits a corpus written by Corpus.py.  The exercises are gathered into one array for each version, species,
+    and mode, since those share a cantus, and each array is validated as a single batch.  The summary of each version is
+    returned, keyed by the name of the version.
+    """
+
+    Lines = {}
+    Cantus = {}
+    with open(Path) as File:
+        for Line in File:
+            Record = json.loads(Line)
+            Key = Record["Version"], Record["Species"], Record["Mode"]
+            Cantus[Key] = Record["Cantus"]
+            Lines.setdefault(Key, []).append(Record["Counterpoint"])
+
+    Results = {}
+    for Key in Lines:
+        Counts = Summary(Validate(Cantus[Key], Lines[Key]))
+        Counts["Exercises"] = len(Lines[Key])
+
+        Total = Results.setdefault(Key[0], dict.fromkeys(Counts, 0))
+        for Name in Counts:
+            Total[Name] += Counts[Name]
+
+    return Results
+
+
+if __name__ == "__main__":
+    Parser = ArgumentParser(description="Check a corpus of counterpoint exercises against the rules.")
+    Parser.add_argument("Corpus", help="a file written by Corpus.py, one JSON object per line")
+    Arguments = Parser.parse_args()
+
+    Results = AuditCorpus(Arguments.Corpus)
+
+    Columns = ["Exercises"] + RuleNames + ["Any"]
+    print("%-18s" % "Version" + "".join("%16s" % Name for Name in Columns))
+    for Version, Counts in Results.items():
+        print("%-18s" % Version + "".join("%16d" % Counts[Name] for Name in Columns))